@@ -0,0 +1,97 @@
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+from metrics import incr
+
+# DOM must stay unchanged this long before a page counts as settled
+QUIET_MS = 300
+
+# Bounds on the wait budget for a domain, in milliseconds
+MIN_BUDGET_MS = 1000
+MAX_BUDGET_MS = 15000
+DEFAULT_BUDGET_MS = 5000
+
+# Settle times kept per domain
+MAX_SAMPLES = 50
+
+SETTLE_ATTR_RE = re.compile(r'data-settle-ms="(\d+)"')
+TIMEOUT_ATTR_RE = re.compile(r'data-settle-timeout="1"')
+
+# Polled by crawl4ai's `wait_for`. The first call installs a MutationObserver;
+# the page is ready once the content selector is present (if given) and the DOM
+# has been quiet for QUIET_MS, or once the budget is spent. The settle time is
+# written onto <html> so it can be read back from the returned HTML, with a
+# timeout flag when the page never settled within the budget.
+WAIT_JS = """js:() => {
+    const s = window.__settle || (window.__settle = (() => {
+        const st = {last: performance.now()};
+        new MutationObserver(() => { st.last = performance.now(); })
+            .observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+        return st;
+    })());
+    const now = performance.now();
+    const found = !%(selector)s || document.querySelector(%(selector)s);
+    const settled = found && now - s.last >= %(quiet)d;
+    const ready = settled || now >= %(budget)d;
+    if (ready) {
+        document.documentElement.setAttribute("data-settle-ms", Math.round(now));
+        if (!settled) document.documentElement.setAttribute("data-settle-timeout", "1");
+    }
+    return ready;
+}"""
+
+
+def domain_of(url):
+    return urlsplit(url).netloc.lower()
+
+
+# === Settle Statistics ===
+# Learns how long pages of each domain take to settle, from past runs, and
+# turns that into a per-domain wait condition and budget.
+class SettleStats:
+    def __init__(self, path="settle_times.json"):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.samples = json.load(f)
+        except FileNotFoundError:
+            self.samples = {}
+
+    def budget_ms(self, domain):
+        samples = sorted(self.samples.get(domain, []))
+        if not samples:
+            return DEFAULT_BUDGET_MS
+        p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+        return int(min(MAX_BUDGET_MS, max(MIN_BUDGET_MS, p90 * 1.5)))
+
+    def wait_condition(self, domain, content_selector=None):
+        return WAIT_JS % {
+            "selector": json.dumps(content_selector or ""),
+            "quiet": QUIET_MS,
+            "budget": self.budget_ms(domain),
+        }
+
+    def record(self, url, html):
+        # Reads the settle time stamped by WAIT_JS; returns it or None. Pages
+        # that timed out are kept as censored samples at the time they gave up
+        # (the budget): a few of them stay above the p90 and change nothing,
+        # while a domain where more than a tenth of pages time out gets its
+        # budget raised by half on the next run, up to MAX_BUDGET_MS.
+        match = SETTLE_ATTR_RE.search(html or "")
+        if not match:
+            return None
+        settle_ms = int(match.group(1))
+        if TIMEOUT_ATTR_RE.search(html):
+            incr("settle_timeouts", domain=domain_of(url))
+        samples = self.samples.setdefault(domain_of(url), [])
+        samples.append(settle_ms)
+        del samples[:-MAX_SAMPLES]
+        return settle_ms
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.samples, f, indent=2)
+        os.replace(tmp, self.path)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from seen_store import fingerprint
+
+# Records buffered before a flush, and the longest a record may wait
+FLUSH_EVERY = 50
+FLUSH_INTERVAL = 5.0
+
+# Newest rotated segment already loaded into the graph
+LOADED_SEGMENT_PATH = "loaded_segment.json"
+
+
+def article_record(url, content, markdown, nm="", desc=""):
+    # The JSONL record both crawlers emit for one extracted article
+    return {
+        "datetime": datetime.now(timezone.utc).isoformat(),
+        "url": url,
+        "published_date": content.get("published_date", ""),
+        "headline": content.get("headline", ""),
+        "summary": content.get("summary", ""),
+        "product": content.get("product", ""),
+        "target": content.get("target", ""),
+        "description": str(markdown or ""),
+        "web_name": nm,
+        "web_desc": desc,
+        "duplicate_of": content.get("duplicate_of", ""),
+    }
+
+
+def rotated_name(path, when):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{when.strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+
+
+# === Article Sink ===
+# Shared async writer for crawled articles. Keeps one append handle open,
+# buffers records and writes them in fsync'd batches, so a crash loses at most
+# the unflushed buffer and never corrupts earlier lines. The live file is
+# rotated to a timestamped segment by size and/or date. With `queue`, records
+# go straight to an asyncio.Queue (e.g. graph_loader_consumer) instead.
+class ArticleSink:
+    def __init__(self, path="extracted_articles.json", flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL,
+                 max_bytes=None, rotate_daily=False, queue=None):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.queue = queue
+        self.written = 0
+        self._buffer = []
+        self._lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._opened_on = None
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_on = datetime.now(timezone.utc).date()
+
+    def _rotate_if_needed(self):
+        today = datetime.now(timezone.utc).date()
+        too_big = self.max_bytes is not None and self._file.tell() >= self.max_bytes
+        new_day = self.rotate_daily and today != self._opened_on
+        if not (too_big or new_day) or self._file.tell() == 0:
+            return
+        self._file.close()
+        os.replace(self.path, rotated_name(self.path, datetime.now(timezone.utc)))
+        self._open()
+
+    def _write_batch(self, lines):
+        if self._file is None:
+            self._open()
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._rotate_if_needed()
+
+    async def write(self, record):
+        if self.queue is not None:
+            await self.queue.put(record)
+            self.written += 1
+            return
+        async with self._lock:
+            self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+            self.written += 1
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            if len(self._buffer) >= self.flush_every or due:
+                await self._flush_locked()
+
+    async def _flush_locked(self):
+        lines, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if lines:
+            await asyncio.to_thread(self._write_batch, lines)
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush_locked()
+
+    def record_seen(self, seen_store, saved):
+        # Marks (url, page fingerprint) pairs as ingested once their records
+        # are durable: after flush() for the file, but only after the graph
+        # load in queue mode, which graph_loader_consumer takes care of
+        if self.queue is not None:
+            return
+        for url, page_fp in saved:
+            seen_store.add(url, page_fp)
+
+    async def close(self):
+        await self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def segment_pattern(path):
+    # Rotated segment names produced by rotated_name for `path`
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return re.compile(rf"{re.escape(stem)}\.\d{{8}}-\d{{6}}-\d{{6}}{re.escape(ext)}")
+
+
+def article_files(path="extracted_articles.json", after=None):
+    # Rotated segments (oldest first) followed by the live file. With `after`
+    # (the newest segment already loaded), older segments are left out.
+    directory = os.path.dirname(path) or "."
+    pattern = segment_pattern(path)
+    after = os.path.basename(after) if after else ""
+    segments = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if pattern.fullmatch(name) and name > after
+    )
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+def read_loaded_segment(path=LOADED_SEGMENT_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("segment")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_loaded_segment(files, article_path="extracted_articles.json", path=LOADED_SEGMENT_PATH):
+    # Records the newest rotated segment in `files` once they are all loaded;
+    # the live file is still appended to and is read again next time
+    pattern = segment_pattern(article_path)
+    segments = [f for f in files if pattern.fullmatch(os.path.basename(f))]
+    if not segments:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"segment": os.path.basename(segments[-1])}, f)
+    os.replace(tmp, path)
+
+
+# Drains a sink queue into the graph loader in batches until a None sentinel.
+# `load` is a blocking callable taking a list of records, e.g.
+# lambda rows: load_articles(driver, rows); it runs in a worker thread. With a
+# SeenStore, the records of a batch are marked as ingested once it is loaded.
+async def graph_loader_consumer(queue, load, batch_size=500, max_wait=5.0, seen_store=None):
+    batch = []
+    while True:
+        timed_out = False
+        try:
+            record = await asyncio.wait_for(queue.get(), timeout=max_wait)
+        except asyncio.TimeoutError:
+            record, timed_out = None, True
+        finished = record is None and not timed_out
+
+        if record is not None:
+            batch.append(record)
+        # Flush full batches, and partial ones when the crawl goes quiet or ends
+        if batch and (finished or timed_out or len(batch) >= batch_size):
+            await asyncio.to_thread(load, batch)
+            if seen_store is not None:
+                for r in batch:
+                    seen_store.add(r["url"], fingerprint(r["description"]))
+            batch = []
+        if finished:
+            return
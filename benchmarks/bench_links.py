@@ -0,0 +1,110 @@
+"""Micro-benchmark for depth-1 link extraction.
+
+Runs the original BeautifulSoup loop from crawl_html and every available
+link_extract backend over saved listing pages and reports pages/sec.
+
+    python benchmarks/bench_links.py --selector ".news-list" page1.html page2.html
+    python benchmarks/bench_links.py            # synthetic 5000-anchor listing page
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from urllib.parse import urldefrag, urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from link_extract import available_backends, extract_links  # noqa: E402
+
+BASE_URL = "https://example.com/news/"
+
+
+def synthetic_listing(anchors=5000):
+    items = []
+    for i in range(anchors):
+        if i % 10 == 0:
+            href = f"/news/page/{i // 10}/"
+        elif i % 17 == 0:
+            href = f"/files/report-{i}.pdf"
+        elif i % 5 == 0:
+            href = f"https://example.com/news/article-{i}/#comments"
+        else:
+            href = f"/news/article-{i}/"
+        items.append(f'<li class="item"><h3><a href="{href}">Article {i}</a></h3><p>Teaser {i}</p></li>')
+    return (
+        "<html><head><title>News</title></head><body><nav><a href='/'>Home</a></nav>"
+        f"<ul class='news-list'>{''.join(items)}</ul><footer>Footer</footer></body></html>"
+    )
+
+
+def legacy_extract(html, base_url, targets):
+    # The depth-1 loop as originally written in crawl_html
+    soup = BeautifulSoup(html, 'html.parser')
+    found = False
+    article_links = set()
+    for target in targets:
+        target_element = soup.select(target)
+        if not target_element:
+            continue
+        for element in target_element:
+            for link in element.select('a[href]'):
+                href = link['href']
+                link.get_text(strip=True)
+                if not href or href.startswith('#') or href.startswith('javascript:'):
+                    continue
+                if not href.startswith('http'):
+                    href = urljoin(base_url, href)
+                normalized_href = urldefrag(href)[0]
+                if re.search(r"(page=\d+|/page/\d+/?)", normalized_href, re.IGNORECASE):
+                    continue
+                if re.search(r"\.(pdf|docx?|xlsx?|pptx?|zip|rar)(\?|$)", normalized_href, re.IGNORECASE):
+                    continue
+                article_links.add(normalized_href)
+            found = True
+    return article_links, found
+
+
+def bench(name, fn, pages, repeat):
+    fn(*pages[0])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            links, _ = fn(*page)
+    elapsed = time.perf_counter() - start
+    runs = repeat * len(pages)
+    print(f"{name:<12} {runs / elapsed:10.1f} pages/sec  {elapsed / runs * 1000:8.2f} ms/page  {len(links)} links")
+    return set(links)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="*", help="saved listing pages (HTML files)")
+    parser.add_argument("--selector", action="append", help="CSS selector(s) holding article links")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        htmls = []
+        for path in args.fixtures:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                htmls.append(f.read())
+        selectors = args.selector or ["body"]
+    else:
+        htmls = [synthetic_listing()]
+        selectors = args.selector or [".news-list"]
+    pages = [(html, args.base_url, selectors) for html in htmls]
+
+    print(f"{len(pages)} page(s), {sum(len(h) for h in htmls) / 1024:.0f} KiB, selectors {selectors}")
+    baseline = bench("legacy-bs4", legacy_extract, pages, args.repeat)
+    for backend in available_backends():
+        links = bench(backend, lambda h, u, s, b=backend: extract_links(h, u, s, backend=b), pages, args.repeat)
+        if links != baseline:
+            print(f"  warning: {backend} returned {len(links ^ baseline)} links different from legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Offline throughput benchmark for the crawl -> extract -> graph pipeline.
+
+Replays a synthetic corpus (or saved article pages) through crawl_html,
+crawl_rss and the graph loader, with benchmarks/fakes.py standing in for
+the browser, the extraction LLM and Neo4j. Each phase runs in its own process
+and reports articles/sec, its own peak RSS, per-stage time (from metrics.py)
+and, for the crawl phases, the mean score_content of the written articles for
+every corpus size.
+
+    python benchmarks/bench_pipeline.py --articles 1000 10000 100000
+    python benchmarks/bench_pipeline.py --llm-latency-ms 800 --concurrency 20 --articles 2000
+    python benchmarks/bench_pipeline.py --fixtures saved/*.html --json results.json
+    python benchmarks/bench_pipeline.py --syndication 0.3 --dedup   # near-duplicate detection
+    python benchmarks/bench_pipeline.py --token-budget 0   # no content pruning
+    python benchmarks/bench_pipeline.py --local-extraction   # gazetteer before the LLM
+    python benchmarks/bench_pipeline.py --baseline results.json   # exit 1 on regressions
+
+Real network and model latency are not part of the numbers unless simulated
+with --fetch-latency-ms, --llm-latency-ms and --llm-ms-per-1k-tokens; the
+graph phase measures the client-side loader work only.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawl4_direct  # noqa: E402
+import crawl4_rss  # noqa: E402
+from adaptive_wait import SettleStats  # noqa: E402
+from article_sink import ArticleSink, article_record  # noqa: E402
+from blob_store import BlobStore  # noqa: E402
+from content_prune import DEFAULT_TOKEN_BUDGET  # noqa: E402
+from crawl4_direct import score_content  # noqa: E402
+from extraction_cache import ExtractionCache  # noqa: E402
+from feed_fetcher import FeedState  # noqa: E402
+from json_to_graph import iter_articles, load_articles, load_articles_parallel  # noqa: E402
+from metrics import metrics  # noqa: E402
+from near_dup import NearDuplicateIndex  # noqa: E402
+
+from fakes import (  # noqa: E402
+    PRODUCTS, Corpus, FakeCrawler, FakeDriver, fake_fetch_feeds, fake_iter_static,
+    install_fake_llm, load_fixtures,
+)
+
+PHASES = ("html", "rss", "graph")
+
+# Prefix of the result line a phase subprocess prints
+RESULT_PREFIX = "BENCH_RESULT "
+SOURCE_NAME = "BENCH SOURCE"
+SOURCE_DESC = "Synthetic benchmark source"
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS. It is a high-water mark
+    # for the whole process, so every phase runs in its own (see run_isolated).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stage_times():
+    stages = {}
+    for hist in metrics.report()["histograms"]:
+        if hist["name"] != "stage_seconds":
+            continue
+        labels = dict(hist["labels"])
+        name = labels.pop("stage")
+        if labels:
+            name += "[" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "]"
+        stages[name] = {"count": hist["count"], "seconds": round(hist["sum"], 3), "mean_ms": round(hist["mean"] * 1000, 2)}
+    return stages
+
+
+def counters():
+    return {
+        c["name"] + "".join(f"[{k}={v}]" for k, v in sorted(c["labels"].items())): c["value"]
+        for c in metrics.report()["counters"]
+    }
+
+
+def completeness(path):
+    # Mean score_content of the articles a crawl phase wrote
+    scores = [score_content(row) for row in iter_articles(path)]
+    return round(sum(scores) / len(scores), 3) if scores else 0.0
+
+
+def token_budget(args):
+    return args.token_budget or None
+
+
+def dedup_index(workdir, args):
+    return NearDuplicateIndex(os.path.join(workdir, "near_duplicates.db")) if args.dedup else None
+
+
+async def run_html(corpus, workdir, args):
+    crawler = FakeCrawler(corpus, concurrency=args.concurrency, fetch_latency=args.fetch_latency_ms / 1000)
+    cache = ExtractionCache(os.path.join(workdir, "extraction_cache.db"))
+    sink = ArticleSink(os.path.join(workdir, "html_articles.json"))
+    dedup = dedup_index(workdir, args)
+    crawl4_direct.iter_static = fake_iter_static(corpus, args.fetch_latency_ms / 1000)
+    try:
+        await crawl4_direct.crawl_html(
+            corpus.listing_urls(), [".news-list"], SOURCE_NAME, SOURCE_DESC,
+            max_concurrent=args.concurrency,
+            extraction_cache=cache,
+            crawler=crawler,
+            http_first=args.http_first,
+            settle_stats=SettleStats(os.path.join(workdir, "settle_times.json")),
+            sink=sink,
+            dedup=dedup,
+            token_budget=token_budget(args),
+            local_extraction=args.local_extraction,
+        )
+    finally:
+        await sink.close()
+        cache.close()
+        if dedup is not None:
+            dedup.close()
+    return sink.written
+
+
+async def run_rss(corpus, workdir, args):
+    crawler = FakeCrawler(corpus, concurrency=args.concurrency, fetch_latency=args.fetch_latency_ms / 1000)
+    cache = ExtractionCache(os.path.join(workdir, "extraction_cache_rss.db"))
+    sink = ArticleSink(os.path.join(workdir, "rss_articles.json"))
+    dedup = dedup_index(workdir, args)
+    crawl4_rss.fetch_feeds = fake_fetch_feeds(corpus)
+    try:
+        await crawl4_rss.crawl_rss(
+            corpus.listing_urls(),
+            extraction_cache=cache,
+            crawler=crawler,
+            feed_state=FeedState(os.path.join(workdir, "feed_state.json")),
+            sink=sink,
+            nm=SOURCE_NAME,
+            desc=SOURCE_DESC,
+            dedup=dedup,
+            token_budget=token_budget(args),
+            local_extraction=args.local_extraction,
+        )
+    finally:
+        await sink.close()
+        cache.close()
+        if dedup is not None:
+            dedup.close()
+    return sink.written
+
+
+def write_graph_input(corpus, path):
+    # Crawler output for the whole corpus, as the sink would have written it
+    with open(path, "w", encoding="utf-8") as f:
+        for k in range(corpus.size):
+            article = corpus.article(k)
+            product = next((p for p in PRODUCTS if p in article.markdown), "")
+            fields = {
+                "headline": article.markdown.split("\n", 1)[0].lstrip("# "),
+                "summary": "",
+                "published_date": "",
+                "product": product,
+                "target": PRODUCTS.get(product, ""),
+            }
+            record = article_record(corpus.article_url(k), fields, article.markdown, SOURCE_NAME, SOURCE_DESC)
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def run_graph(path, workdir, args):
+    driver = FakeDriver(write_latency=args.write_latency_ms / 1000)
+    blob_store = BlobStore(os.path.join(workdir, "bodies"))
+    watermark = os.path.join(workdir, "graph_watermark.json")
+    dedup = dedup_index(workdir, args)
+    articles = iter_articles(path)
+    try:
+        if args.graph_workers > 1:
+            load_articles_parallel(driver, articles, workers=args.graph_workers,
+                                   watermark_path=watermark, blob_store=blob_store, dedup=dedup)
+        else:
+            load_articles(driver, articles, watermark_path=watermark, blob_store=blob_store, dedup=dedup)
+    finally:
+        blob_store.close()
+        if dedup is not None:
+            dedup.close()
+    return len(driver.content)
+
+
+def run_phase(phase, corpus, args):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{phase}-") as workdir:
+        if phase == "graph":
+            # Setup, not timed: the crawler output the loader reads
+            graph_input = os.path.join(workdir, "graph_articles.json")
+            write_graph_input(corpus, graph_input)
+        gc.collect()
+        metrics.reset()
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(sys.stdout if args.verbose else devnull):
+            if phase == "html":
+                articles = asyncio.run(run_html(corpus, workdir, args))
+            elif phase == "rss":
+                articles = asyncio.run(run_rss(corpus, workdir, args))
+            else:
+                articles = run_graph(graph_input, workdir, args)
+        elapsed = time.perf_counter() - start
+        score = completeness(os.path.join(workdir, f"{phase}_articles.json")) if phase != "graph" else None
+
+    return {
+        "articles": articles,
+        "seconds": round(elapsed, 3),
+        "articles_per_sec": round(articles / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "completeness": score,
+        "stages": stage_times(),
+        "counters": counters(),
+    }
+
+
+def run_isolated(size, phase):
+    # Runs one phase in a fresh interpreter with the same options, so its peak
+    # RSS is its own rather than the highest of every phase run before it
+    argv = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--run", str(size), phase]
+    proc = subprocess.run(argv, stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"{phase} phase with {size} articles failed (exit {proc.returncode})")
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+        print(line)
+    raise SystemExit(f"{phase} phase with {size} articles printed no result")
+
+
+def print_phase(size, phase, result):
+    print(f"\n{phase:<5} {size:>7} articles: {result['articles']} written in {result['seconds']:.2f}s "
+          f"({result['articles_per_sec']:.1f} articles/sec), peak RSS {result['peak_rss_mb']:.0f} MB")
+    if result["completeness"] is not None:
+        print(f"    {'completeness (mean score_content)':<40} {result['completeness']:>10}")
+    for name, stage in sorted(result["stages"].items(), key=lambda s: -s[1]["seconds"]):
+        print(f"    {name:<40} {stage['count']:>8}x  {stage['seconds']:10.3f}s  {stage['mean_ms']:10.2f} ms avg")
+    for name, value in sorted(result["counters"].items()):
+        print(f"    {name:<40} {value:>10}")
+
+
+def compare(results, baseline_path, tolerance):
+    # Regressions: articles/sec more than `tolerance` below the baseline run
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for size, phases in results.items():
+        for phase, result in phases.items():
+            before = baseline.get(size, {}).get(phase)
+            if not before or not before["articles_per_sec"]:
+                continue
+            ratio = result["articles_per_sec"] / before["articles_per_sec"]
+            marker = "REGRESSION" if ratio < 1 - tolerance else "ok"
+            print(f"{phase:<5} {size:>7}: {before['articles_per_sec']:10.1f} -> "
+                  f"{result['articles_per_sec']:10.1f} articles/sec ({ratio:6.1%})  {marker}")
+            if marker != "ok":
+                regressions.append((size, phase))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, nargs="+", default=[1000], help="corpus sizes to run")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    parser.add_argument("--fixtures", nargs="*", help="saved article pages (HTML) instead of synthetic ones")
+    parser.add_argument("--per-listing", type=int, default=500, help="article links per listing page / feed")
+    parser.add_argument("--syndication", type=float, default=0.0, help="share of articles re-published elsewhere")
+    parser.add_argument("--dedup", action="store_true", help="run with a near-duplicate index")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="content tokens sent to the LLM per page, 0 sends whole pages")
+    parser.add_argument("--local-extraction", action="store_true",
+                        help="find fields with the gazetteer first, calling the LLM only for missing ones")
+    parser.add_argument("--concurrency", type=int, default=10, help="pages in flight in the fake crawler")
+    parser.add_argument("--fetch-latency-ms", type=float, default=0.0, help="simulated page load time")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated model call time")
+    parser.add_argument("--llm-ms-per-1k-tokens", type=float, default=0.0, help="simulated time per 1k prompt tokens")
+    parser.add_argument("--write-latency-ms", type=float, default=0.0, help="simulated Neo4j transaction time")
+    parser.add_argument("--graph-workers", type=int, default=4, help="1 uses the serial loader")
+    parser.add_argument("--http-first", action="store_true", help="crawl_html static-HTML-first path")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed articles/sec drop vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="keep the crawlers' console output")
+    parser.add_argument("--run", nargs=2, metavar=("SIZE", "PHASE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # Phase subprocess started by run_isolated
+        size, phase = int(args.run[0]), args.run[1]
+        install_fake_llm(args.llm_latency_ms / 1000, args.llm_ms_per_1k_tokens / 1000)
+        metrics.enable()
+        fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+        corpus = Corpus(size, per_listing=args.per_listing, fixtures=fixtures, syndication=args.syndication)
+        print(RESULT_PREFIX + json.dumps(run_phase(phase, corpus, args)))
+        return
+
+    results = {}
+    for size in args.articles:
+        results[str(size)] = {}
+        for phase in args.phases:
+            result = run_isolated(size, phase)
+            results[str(size)][phase] = result
+            print_phase(size, phase, result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        print("\n=== Baseline comparison ===")
+        if compare(results, args.baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""Local stand-ins for the browser, the extraction LLM and Neo4j.
+
+Used by bench_pipeline.py to drive crawl_html / crawl_rss / the graph loaders
+without network access. Everything is deterministic for a given corpus.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from crawl4ai.extraction_strategy import LLMExtractionStrategy
+
+from json_to_graph import ARTICLE_BATCH_QUERY, DUPLICATE_BATCH_QUERY, PARTITION_CONTENT_QUERY
+
+BASE_URL = "https://bench.local"
+
+# Product -> target pairs from the crawl_rss extraction instruction
+PRODUCTS = {
+    "BCG Tice": "Bacterial immunopotentiator",
+    "Adstiladrin": "Non-replicating AAV with IFN alpha2b gene",
+    "Vicineum": "Anti-ECAM exotoxin A fusion protein",
+    "Keytruda": "Anti-PD-1 mAb",
+    "Pembrolizumab": "Anti-PD-1 mAb",
+    "UGN-102": "D- synthesis inhibitor",
+    "EG-70": "IL-12 non-viral gene therapy",
+    "Erdafitinib": "FGFR inhibitor",
+    "TAR-200": "Gemcitabine-releasing intravesical system",
+    "TLD-1433": "Ruthenium-based photosensitizer",
+    "Enfortumab Vedotin": "Nectin-4-directed",
+    "TARA-002": "TLR-4 agonists",
+}
+
+MONTHS = ("January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December")
+
+# Sentence templates; the slots are filled per article so unrelated articles
+# share few word shingles, like real press releases
+SENTENCES = (
+    "The company reported {w} topline data from {n} {w} patients in the {w} study.",
+    "Patients with {w} bladder cancer were enrolled across {n} {w} sites in {w}.",
+    "The {w} endpoint was complete response at {n} months in the {w} cohort.",
+    "Investigators observed {w} {w} events in {n} percent of {w} subjects.",
+    "Management expects a {w} filing with {w} regulators by {w} {n}.",
+    "The {w} therapy is administered {w} every {n} weeks in {w} settings.",
+    "Durability of {w} response will be assessed at {n} and {n} months by {w}.",
+    "The board approved a {w} agreement worth {n} million with {w} {w}.",
+    "Analysts at {w} noted the {w} results compare {w} with {n} prior trials.",
+    "Additional {w} data will be presented at the {w} {w} conference in {n}.",
+)
+
+_SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "zen", "pha", "cor", "lix", "dra", "tem", "sol", "bri")
+_rng = random.Random(0)
+WORDS = sorted({"".join(_rng.choice(_SYLLABLES) for _ in range(3)) for _ in range(3000)})
+del _rng
+
+SLOT_PATTERN = re.compile(r"\{(w|n)\}")
+ARTICLE_MARKER = re.compile(r"<!-- article:(\d+) -->")
+ARTICLE_URL = re.compile(r"/news/article-(\d+)/")
+LISTING_URL = re.compile(r"/news/list-(\d+)/")
+DATE_PATTERN = re.compile(r"\b(\d{1,2} (?:%s) \d{4})\b" % "|".join(MONTHS))
+
+# Tokens added by the extraction prompt template around the page content
+PROMPT_OVERHEAD_TOKENS = 600
+COMPLETION_TOKENS = 120
+
+
+@dataclass
+class Article:
+    html: str
+    markdown: str
+
+
+# === Synthetic Corpus ===
+# `size` articles spread over listing pages of `per_listing` links. Article
+# pages are generated on demand from their index, so even 100k-article
+# corpora cost no memory up front. With `fixtures` (saved article pages and
+# their markdown) the corpus cycles through those instead, made unique per index.
+class Corpus:
+    def __init__(self, size, per_listing=500, fixtures=None, short_every=10, syndication=0.0):
+        self.size = size
+        self.per_listing = per_listing
+        self.fixtures = fixtures or []
+        # Every `short_every`-th article is a thin JS shell that fails the static check
+        self.short_every = short_every
+        # Share of articles that re-publish an earlier article under another
+        # header and footer (as Newsfile / GlobeNewswire copies do)
+        self.syndication = syndication
+
+    @property
+    def listings(self):
+        return (self.size + self.per_listing - 1) // self.per_listing
+
+    def listing_url(self, i):
+        return f"{BASE_URL}/news/list-{i}/"
+
+    def article_url(self, k):
+        return f"{BASE_URL}/news/article-{k}/"
+
+    def listing_urls(self):
+        return [self.listing_url(i) for i in range(self.listings)]
+
+    def listing_articles(self, i):
+        start = i * self.per_listing
+        return range(start, min(start + self.per_listing, self.size))
+
+    def listing_html(self, i):
+        items = "".join(
+            f'<li class="item"><h3><a href="/news/article-{k}/">Article {k}</a></h3></li>'
+            for k in self.listing_articles(i)
+        )
+        return (
+            "<html><head><title>News</title></head><body>"
+            "<nav><a href='/'>Home</a><a href='/news/page/2/'>Next</a></nav>"
+            f"<ul class='news-list'>{items}</ul><footer>Footer</footer></body></html>"
+        )
+
+    def article(self, k):
+        if k > 0 and self.syndication and random.Random(-k).random() < self.syndication:
+            original = self._original(random.Random(-k).randrange(k))
+            html = original.html.replace("<article>", "<article><p>Distributed by Bench Newswire.</p>", 1)
+            html = ARTICLE_MARKER.sub(f"<!-- article:{k} -->", html)
+            html = html.replace("</article>", "<p>Contact: media relations, Bench Newswire.</p></article>", 1)
+            markdown = f"Distributed by Bench Newswire.\n\n{original.markdown}\nContact: media relations, Bench Newswire.\n"
+            return Article(html, markdown)
+        return self._original(k)
+
+    def _original(self, k):
+        if self.fixtures:
+            html, markdown = self.fixtures[k % len(self.fixtures)]
+            html = html.replace("</body>", f"<p>Reference {k}</p><!-- article:{k} --></body>", 1)
+            return Article(html, f"{markdown}\n\nReference {k}\n")
+
+        rng = random.Random(k)
+        product = rng.choice(list(PRODUCTS))
+        date = f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(2019, 2025)}"
+        headline = f"{product} study update {k}: company announces new clinical results"
+        count = 2 if self.short_every and k % self.short_every == 0 else rng.randint(12, 30)
+        fill = lambda m: rng.choice(WORDS) if m.group(1) == "w" else str(rng.randint(2, 900))  # noqa: E731
+        paragraphs = [
+            " ".join(SLOT_PATTERN.sub(fill, rng.choice(SENTENCES)) for _ in range(4))
+            for _ in range(count)
+        ]
+        paragraphs.insert(1, f"The study evaluates {product} in patients with bladder cancer.")
+
+        html = (
+            f"<html><head><title>{headline}</title></head><body>"
+            "<header><nav><a href='/'>Home</a><a href='/news/'>News</a></nav></header>"
+            "<div class='cookie-banner'>We use cookies to improve your experience.</div>"
+            f"<article><h1>{headline}</h1><time>{date}</time>"
+            + "".join(f"<p>{p}</p>" for p in paragraphs)
+            + "</article><aside><h4>Related</h4><a href='/news/'>More news</a></aside>"
+            f"<footer>Copyright Bench Inc.</footer><!-- article:{k} --></body></html>"
+        )
+        markdown = f"# {headline}\n\n{date}\n\n" + "\n\n".join(paragraphs) + "\n\n#### Related\n[More news](/news/)\n"
+        return Article(html, markdown)
+
+    def article_for(self, url_or_html):
+        match = ARTICLE_MARKER.search(url_or_html) or ARTICLE_URL.search(url_or_html)
+        return self.article(int(match.group(1))) if match else None
+
+
+def load_fixtures(paths):
+    # (html, markdown) pairs; markdown comes from crawl4ai's own generator
+    from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+
+    generator = DefaultMarkdownGenerator()
+    fixtures = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        markdown = generator.generate_markdown(input_html=html, base_url=BASE_URL).raw_markdown
+        fixtures.append((html, markdown))
+    return fixtures
+
+
+# === Fake Crawler ===
+# Duck-typed AsyncWebCrawler serving corpus pages. Runs the config's
+# extraction strategy on the page markdown like the real crawler, so the
+# extraction cache (and anything hooked into the strategy's run) is exercised.
+# Dispatchers and rate limiters are ignored; `concurrency` bounds pages in flight.
+@dataclass
+class FakeResult:
+    url: str
+    success: bool
+    html: str = ""
+    markdown: str = ""
+    extracted_content: str = None
+    error_message: str = ""
+
+
+class FakeCrawler:
+    def __init__(self, corpus, concurrency=10, fetch_latency=0.0):
+        self.corpus = corpus
+        self.concurrency = concurrency
+        self.fetch_latency = fetch_latency
+        self.pages = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def _crawl(self, url, config):
+        self.pages += 1
+        if url.startswith("raw:"):
+            html = url[4:]
+            article = self.corpus.article_for(html)
+        else:
+            if self.fetch_latency:
+                await asyncio.sleep(self.fetch_latency)
+            listing = LISTING_URL.search(url)
+            if listing:
+                return FakeResult(url, True, html=self.corpus.listing_html(int(listing.group(1))))
+            article = self.corpus.article_for(url)
+            html = article.html if article else ""
+        if article is None:
+            return FakeResult(url, False, error_message="404 Not Found")
+
+        result = FakeResult(url, True, html=html, markdown=article.markdown)
+        strategy = getattr(config, "extraction_strategy", None)
+        if strategy is not None:
+            blocks = await asyncio.to_thread(strategy.run, url, [article.markdown])
+            result.extracted_content = json.dumps(blocks)
+        return result
+
+    async def _safe_crawl(self, url, config):
+        if isinstance(config, list):
+            # Per-URL configs, picked like crawl4ai's dispatcher does
+            config = next((c for c in config if c.is_match(url)), None)
+            if config is None:
+                return FakeResult(url, False, error_message="No matching configuration found")
+        try:
+            return await self._crawl(url, config)
+        except Exception as e:
+            return FakeResult(url, False, error_message=str(e))
+
+    async def _stream(self, urls, config):
+        # A fixed pool of workers, so 100k URLs never become 100k pending tasks
+        results = asyncio.Queue()
+        pending = iter(urls)
+
+        async def worker():
+            for url in pending:
+                await results.put(await self._safe_crawl(url, config))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            for _ in range(len(urls)):
+                yield await results.get()
+        finally:
+            for w in workers:
+                w.cancel()
+
+    async def arun_many(self, urls, config=None, dispatcher=None, **kwargs):
+        urls = list(urls)
+        first = config[0] if isinstance(config, list) and config else config
+        if getattr(first, "stream", False):
+            return self._stream(urls, config)
+        return [result async for result in self._stream(urls, config)]
+
+    async def arun(self, url, config=None, **kwargs):
+        return await self._safe_crawl(url, config)
+
+
+def fake_iter_static(corpus, fetch_latency=0.0):
+    # Replacement for http_fetch.iter_static serving corpus pages, one every
+    # `fetch_latency` / `concurrency` seconds
+    async def iter_static(urls, concurrency=10, timeout=20, headers=None):
+        for url in urls:
+            await asyncio.sleep(fetch_latency / concurrency)
+            article = corpus.article_for(url)
+            yield url, article.html if article else None
+    return iter_static
+
+
+def fake_fetch_feeds(corpus):
+    # Replacement for feed_fetcher.fetch_feeds: one feed per listing page
+    async def fetch_feeds(urls, state, concurrency=20, timeout=30):
+        feeds = {}
+        for url in urls:
+            match = LISTING_URL.search(url)
+            links = [corpus.article_url(k) for k in corpus.listing_articles(int(match.group(1)))] if match else []
+            feeds[url] = ([{"link": link, "id": link} for link in links], {"entries": dict.fromkeys(links)})
+        return feeds
+    return fetch_feeds
+
+
+# === Fake LLM ===
+# Deterministic replacement for the model call in LLMExtractionStrategy.extract:
+# picks the headline, date and product out of the page text after sleeping
+# `latency` seconds plus `per_1k_tokens` seconds per thousand prompt tokens,
+# and books estimated token usage on the strategy.
+def install_fake_llm(latency=0.0, per_1k_tokens=0.0):
+    def extract(self, url, ix, html):
+        prompt_tokens = len(html) // 4 + PROMPT_OVERHEAD_TOKENS
+        if latency or per_1k_tokens:
+            time.sleep(latency + per_1k_tokens * prompt_tokens / 1000)
+        lines = [line.strip("# ").strip() for line in html.splitlines() if line.strip()]
+        body = " ".join(lines[1:])
+        date = DATE_PATTERN.search(html)
+        product = next((p for p in PRODUCTS if p in html), "")
+
+        usage = self.total_usage
+        usage.prompt_tokens += prompt_tokens
+        usage.completion_tokens += COMPLETION_TOKENS
+        usage.total_tokens += prompt_tokens + COMPLETION_TOKENS
+
+        return [{
+            "index": ix,
+            "headline": lines[0] if lines else "",
+            "summary": body[:200],
+            "published_date": date.group(1) if date else "",
+            "product": product,
+            "target": PRODUCTS.get(product, ""),
+            "error": False,
+        }]
+
+    LLMExtractionStrategy.extract = extract
+
+
+# === Fake Graph ===
+# Minimal Neo4j driver for the loaders: keeps link -> content hash in memory
+# and answers the Content upsert and duplicate-link queries the way the real
+# MERGEs would, so the changed/unchanged accounting matches. Every other
+# statement is a no-op.
+class FakeRecords(list):
+    def single(self):
+        return self[0] if self else None
+
+    def consume(self):
+        return None
+
+
+class FakeTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, query, params=None):
+        self.graph.statements += 1
+        if query == DUPLICATE_BATCH_QUERY:
+            return FakeRecords([{"linked": self.graph.link(params["rows"])}])
+        if query not in (ARTICLE_BATCH_QUERY, PARTITION_CONTENT_QUERY):
+            return FakeRecords()
+        changed = self.graph.upsert(params["rows"])
+        if query == ARTICLE_BATCH_QUERY:
+            return FakeRecords([{"written": len(changed)}])
+        return FakeRecords({"link": link} for link in changed)
+
+
+class FakeSession:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, statement, params=None):
+        return FakeTransaction(self.graph).run(statement, params)
+
+    def execute_write(self, fn, *args, **kwargs):
+        if self.graph.write_latency:
+            time.sleep(self.graph.write_latency)
+        return fn(FakeTransaction(self.graph), *args, **kwargs)
+
+
+class FakeDriver:
+    def __init__(self, write_latency=0.0):
+        self.write_latency = write_latency
+        self.content = {}
+        self.alt_links = {}
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, rows):
+        changed = []
+        with self._lock:
+            for row in rows:
+                if self.content.get(row["link"]) != row["content_hash"]:
+                    self.content[row["link"]] = row["content_hash"]
+                    changed.append(row["link"])
+        return changed
+
+    def link(self, rows):
+        # Duplicates newly added to their canonical's alt_links
+        added = 0
+        with self._lock:
+            for row in rows:
+                links = self.alt_links.setdefault(row["canonical"], set())
+                if row["link"] not in links:
+                    links.add(row["link"])
+                    added += 1
+                self.content.setdefault(row["canonical"], row["content_hash"])
+        return added
+
+    def session(self, database=None, **kwargs):
+        return FakeSession(self)
+
+    def close(self):
+        pass
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback keeps the store usable without zstandard
+    zstandard = None
+
+ZSTD_LEVEL = 10
+
+# Characters of the body kept on the Content node when no summary exists
+SUMMARY_CHARS = 500
+
+# Hashes per lookup query, under SQLite's default bound-variable limit
+SQL_VARIABLES = 900
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed bodies")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# === Blob Store ===
+# Content-addressed, compressed storage for article bodies outside the graph.
+# Bodies are appended to a single pack file; a SQLite index maps the SHA-256
+# of each body to its offset and length, so identical bodies are stored once.
+class BlobStore:
+    def __init__(self, directory="bodies"):
+        os.makedirs(directory, exist_ok=True)
+        self.pack_path = os.path.join(directory, "bodies.pack")
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                offset INTEGER,
+                length INTEGER,
+                codec TEXT,
+                raw_length INTEGER
+            )
+        """)
+        self.conn.commit()
+        self.pack = open(self.pack_path, "ab")
+
+    def put(self, text):
+        # Returns (hash, offset, length) of the stored body
+        return self.put_many([text])[0]
+
+    def put_many(self, texts):
+        # Stores a batch of bodies with one write, one fsync and one commit;
+        # bodies already in the store (unchanged articles) are only looked up.
+        # Returns (hash, offset, length) for every text, in order.
+        raws = [text.encode("utf-8") for text in texts]
+        digests = [hashlib.sha256(raw).hexdigest() for raw in raws]
+        with self._lock:
+            known = {}
+            unique = list(dict.fromkeys(digests))
+            for i in range(0, len(unique), SQL_VARIABLES):
+                part = unique[i:i + SQL_VARIABLES]
+                known.update(
+                    (digest, (offset, length)) for digest, offset, length in self.conn.execute(
+                        f"SELECT hash, offset, length FROM blobs WHERE hash IN ({','.join('?' * len(part))})", part
+                    )
+                )
+
+            new_rows, chunks = [], []
+            offset = self.pack.seek(0, os.SEEK_END)
+            for digest, raw in zip(digests, raws):
+                if digest in known:
+                    continue
+                codec, data = _compress(raw)
+                known[digest] = (offset, len(data))
+                new_rows.append((digest, offset, len(data), codec, len(raw)))
+                chunks.append(data)
+                offset += len(data)
+            if new_rows:
+                self.pack.write(b"".join(chunks))
+                self.pack.flush()
+                os.fsync(self.pack.fileno())
+                # Index only after the bytes are durable; a crash leaves at most unreferenced bytes
+                self.conn.executemany("INSERT INTO blobs VALUES (?, ?, ?, ?, ?)", new_rows)
+                self.conn.commit()
+        return [(digest, *known[digest]) for digest in digests]
+
+    def get(self, digest):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT offset, length, codec FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+        if row is None:
+            return None
+        offset, length, codec = row
+        with open(self.pack_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return _decompress(codec, data).decode("utf-8")
+
+    def stats(self):
+        with self._lock:
+            count, stored, raw = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(raw_length), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": count, "stored_bytes": stored, "raw_bytes": raw}
+
+    def close(self):
+        with self._lock:
+            self.pack.close()
+            self.conn.close()
+
+
+def summarize(text, limit=SUMMARY_CHARS):
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+def load_body(content, store):
+    # Full article body for a Content node's properties, read lazily from the
+    # store when the node only carries a body hash
+    if content.get("body_hash") and store is not None:
+        body = store.get(content["body_hash"])
+        if body is not None:
+            return body
+    return content.get("description", "")
@@ -0,0 +1,207 @@
+import re
+from dataclasses import dataclass
+
+# Default prompt budget for the page content sent to the extraction model.
+# Headline, date and the lede fit comfortably; long bodies are cut after that.
+DEFAULT_TOKEN_BUDGET = 1000
+
+# Same estimate crawl4ai uses when chunking pages for the model (whitespace
+# separated words times 1.3)
+TOKENS_PER_WORD = 1.3
+
+# Blocks with more than this share of their words inside links are navigation
+MAX_LINK_DENSITY = 0.5
+
+# A block needs this many words (outside links) to count as article text
+MIN_CONTENT_WORDS = 10
+
+# Below this the page is returned as is; there is nothing worth pruning
+MIN_PRUNE_TOKENS = 200
+
+# The headline is looked for this many blocks before the article text
+HEADLINE_SEARCH_BLOCKS = 6
+
+TOKEN_PATTERN = re.compile(r"\S+")
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_PATTERN = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+
+# Site chrome that survives the excluded tags (cookie notices, share bars, ...)
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|subscribe|newsletter|sign up|log ?in\b|share (?:this|on)|follow us|"
+    r"all rights reserved|privacy policy|terms of (?:use|service)|skip to|"
+    r"related (?:articles|news|posts|stories)|read more|advertisement|back to top",
+    re.IGNORECASE,
+)
+
+MONTH = (r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?")
+DATE_PATTERN = re.compile(
+    rf"\b(?:\d{{1,2}}\s+{MONTH}\s+\d{{4}}|{MONTH}\s+\d{{1,2}},?\s+\d{{4}}|"
+    r"\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4})\b",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text):
+    return int(len(text.split()) * TOKENS_PER_WORD)
+
+
+@dataclass
+class Block:
+    text: str
+    words: int
+    link_words: int
+    heading: bool
+    boilerplate: bool
+
+    @property
+    def tokens(self):
+        return int(self.words * TOKENS_PER_WORD)
+
+    @property
+    def content(self):
+        return not self.heading and not self.boilerplate and self.words - self.link_words >= MIN_CONTENT_WORDS
+
+
+@dataclass
+class Pruned:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    # Keywords on the page that the pruned text no longer mentions
+    keywords_dropped: tuple = ()
+
+    @property
+    def saved(self):
+        return self.tokens_before - self.tokens_after
+
+
+def split_blocks(sections):
+    # One block per line: crawl4ai's markdown puts each paragraph, heading and
+    # list item on its own line, often without blank lines in between
+    blocks = []
+    for section in sections:
+        for text in section.splitlines():
+            text = text.strip()
+            if not text:
+                continue
+            plain = IMAGE_PATTERN.sub(" ", text)
+            words = len(LINK_PATTERN.sub(r"\1", plain).split())
+            link_words = sum(len(m.split()) for m in LINK_PATTERN.findall(plain))
+            heading = bool(HEADING_PATTERN.match(text))
+            boilerplate = (
+                words == 0
+                or link_words > MAX_LINK_DENSITY * words
+                or (words < 40 and BOILERPLATE_PATTERN.search(plain) is not None)
+            )
+            blocks.append(Block(text, words, link_words, heading, boilerplate))
+    return blocks
+
+
+def main_region(blocks):
+    # Densest run of article text: maximum-sum span where text blocks score
+    # their words and navigation / boilerplate blocks cost theirs (at least 5).
+    # Headings in between are free so they do not split the article.
+    best, best_span = 0, None
+    total, start = 0, 0
+    for i, block in enumerate(blocks):
+        if block.content:
+            total += block.words
+        elif not block.heading:
+            total -= max(block.words, 5)
+        if total <= 0:
+            total, start = 0, i + 1
+        elif total > best:
+            best, best_span = total, (start, i)
+    return best_span
+
+
+def find_headline(blocks, start):
+    # Closest heading at or before the article text, else the page's first H1
+    for i in range(start, max(start - HEADLINE_SEARCH_BLOCKS, -1), -1):
+        if blocks[i].heading:
+            return i
+    return next((i for i, b in enumerate(blocks) if b.text.lstrip().startswith("# ")), None)
+
+
+def find_date(blocks, headline, end):
+    # First date from just above the headline to the end of the article text,
+    # else the first date anywhere on the page
+    first = max((headline if headline is not None else 0) - 3, 0)
+    for i in range(first, end + 1):
+        if DATE_PATTERN.search(blocks[i].text):
+            return i
+    return next((i for i, b in enumerate(blocks) if DATE_PATTERN.search(b.text)), None)
+
+
+def truncate_words(text, tokens):
+    # First words of `text` worth `tokens`, keeping its line breaks
+    keep = max(int(tokens / TOKENS_PER_WORD), 1)
+    for n, word in enumerate(TOKEN_PATTERN.finditer(text), 1):
+        if n == keep:
+            return text[:word.end()]
+    return text
+
+
+# Cuts page markdown down to what the article fields are extracted from: the
+# headline, the publication date and the main article text, in page order,
+# within `token_budget`. Text blocks are taken in page order (the lede first),
+# except that blocks mentioning one of `keywords` (e.g. product names) go
+# before the rest of the body. Pages without a recognisable article region
+# are only trimmed to the budget.
+def prune(sections, token_budget=DEFAULT_TOKEN_BUDGET, keywords=()):
+    if isinstance(sections, str):
+        sections = [sections]
+    original = "\n\n".join(s.strip() for s in sections if s and s.strip())
+    before = estimate_tokens(original)
+    if before <= MIN_PRUNE_TOKENS:
+        return Pruned(original, before, before)
+
+    blocks = split_blocks(sections)
+    span = main_region(blocks)
+    if span is None:
+        text = truncate_words(original, token_budget)
+        return Pruned(text, before, estimate_tokens(text), dropped_keywords(original, text, keywords))
+
+    start, end = span
+    headline = find_headline(blocks, start)
+    date = find_date(blocks, headline, end)
+
+    chosen = {}
+    budget = token_budget
+    for i in (headline, date):
+        if i is not None and i not in chosen:
+            fits = blocks[i].tokens <= budget
+            chosen[i] = blocks[i].text if fits else truncate_words(blocks[i].text, max(budget, 0))
+            budget -= blocks[i].tokens
+
+    body = [i for i in range(start, end + 1) if blocks[i].content and i not in chosen]
+    if keywords and body:
+        lowered = [k.lower() for k in keywords if k]
+        mentions = {i for i in body[1:] if any(k in blocks[i].text.lower() for k in lowered)}
+        body = body[:1] + [i for i in body[1:] if i in mentions] + [i for i in body[1:] if i not in mentions]
+    taken = 0
+    for i in body:
+        if blocks[i].tokens <= budget:
+            chosen[i] = blocks[i].text
+            budget -= blocks[i].tokens
+            taken += 1
+        elif not taken:
+            # Always send some article text, even if the lede alone is too long
+            chosen[i] = truncate_words(blocks[i].text, max(budget, MIN_PRUNE_TOKENS))
+            budget, taken = 0, 1
+        if budget <= 0:
+            break
+
+    text = "\n\n".join(chosen[i] for i in sorted(chosen))
+    after = estimate_tokens(text)
+    if after >= before:
+        return Pruned(original, before, before)
+    return Pruned(text, before, after, dropped_keywords(original, text, keywords))
+
+
+def dropped_keywords(original, text, keywords):
+    if not keywords:
+        return ()
+    page, kept = original.lower(), text.lower()
+    return tuple(k for k in keywords if k and k.lower() in page and k.lower() not in kept)
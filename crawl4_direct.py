@@ -1,20 +1,31 @@
 import asyncio
-from urllib.parse import urldefrag, urljoin
+from urllib.parse import urldefrag
 from crawl4ai import (
     AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode,
     MemoryAdaptiveDispatcher, LLMConfig
 )
-import re
-from crawl4ai.extraction_strategy import LLMExtractionStrategy
+from extraction_cache import CachedLLMExtractionStrategy
+from content_prune import DEFAULT_TOKEN_BUDGET
+from local_extract import Gazetteer
 from pydantic import BaseModel
-from bs4 import BeautifulSoup
 import os
-from datetime import datetime, timezone
 import json
+import time
+from contextlib import nullcontext
+from seen_store import fingerprint
+from article_sink import ArticleSink, article_record
+from http_fetch import iter_static, looks_complete
+from adaptive_wait import SettleStats, domain_of
+from link_extract import extract_links
+from metrics import incr, observe, span
 
 # Set Gemini API key
 os.environ["GEMINI_API_KEY"] = "Your-Gemini-API-Key-Here"
 
+# Escalated pages handed to the browser at once; crawl4ai's default
+# dispatcher runs 10 sessions, so smaller waves would leave some idle
+BROWSER_BATCH = 20
+
 # Schema for structured LLM output
 class ArticleData(BaseModel):
     headline: str
@@ -23,17 +34,60 @@ class ArticleData(BaseModel):
     product: str
     target: str
 
+def score_content(entry: dict) -> int:
+    # Score based on how complete the entry is
+    score = 0
+    if entry.get("published_date"): score += 3
+    if entry.get("product"): score += 2
+    if entry.get("target"): score += 2
+    if entry.get("summary") and len(entry.get("summary")) > 30: score += 1
+    if entry.get("headline") and len(entry.get("headline")) > 10: score += 1
+    return score
+
 # Main crawler function
-async def crawl_html(start_urls, targets, nm, desc, max_depth=2, max_concurrent=10):
+# Pass a SeenStore to skip articles ingested by previous runs, an
+# ExtractionCache to reuse LLM results for unchanged pages and a running
+# AsyncWebCrawler to share one browser across sources.
+# With http_first, article pages are fetched over plain HTTP and only sent to
+# the browser when `static_check` (keyword arguments for looks_complete) fails.
+# Browser pages wait adaptively per domain, learned through `settle_stats`.
+# Articles go to `sink` (an ArticleSink shared across sources, by default one
+# writing extracted_articles.json). With `stream`, depth-2 results are
+# processed one by one as they finish instead of after the whole batch.
+# `link_rules` (link_extract.LinkRules) filters depth-1 links for this source.
+# With a NearDuplicateIndex (`dedup`), syndicated copies of articles extracted
+# earlier skip the LLM and are written with `duplicate_of` set.
+# Article pages are pruned to `token_budget` tokens of article text before
+# extraction (None sends the whole page), keeping paragraphs that mention a
+# product from `gazetteer` (default: gazetteer.json). `local_extraction` (off
+# by default) takes the fields found with confidence in the page itself and
+# asks the LLM only for the rest; products the LLM names are kept.
+async def crawl_html(start_urls, targets, nm, desc, max_depth=2, max_concurrent=10, seen_store=None,
+                     extraction_cache=None, crawler=None, http_first=False, static_check=None,
+                     settle_stats=None, sink=None, stream=True, link_rules=None, dedup=None,
+                     token_budget=DEFAULT_TOKEN_BUDGET, gazetteer=None, local_extraction=False):
     if targets is None:
         targets = []
     elif isinstance(targets, str):
         targets = [targets]
+    if settle_stats is None:
+        settle_stats = SettleStats()
+    if gazetteer is None:
+        gazetteer = Gazetteer.from_file()
+    own_sink = sink is None
+    if own_sink:
+        sink = ArticleSink("extracted_articles.json")
+    content_selector = (static_check or {}).get("content_selector")
 
     browser_config = BrowserConfig(headless=True, verbose=False)
 
-    # LLM-based extraction strategy
-    llm_strategy = LLMExtractionStrategy(
+    # LLM-based extraction strategy (cached on page content)
+    llm_strategy = CachedLLMExtractionStrategy(
+        cache=extraction_cache,
+        dedup=dedup,
+        token_budget=token_budget,
+        prune_keywords=gazetteer.keywords(),
+        gazetteer=gazetteer if local_extraction else None,
         llm_config=LLMConfig(
             provider="gemini/gemini-2.0-flash",
             api_token=os.environ["GEMINI_API_KEY"]
@@ -51,15 +105,23 @@ async def crawl_html(start_urls, targets, nm, desc, max_depth=2, max_concurrent=
         excluded_tags=["header", "footer", "form", "nav", ".cookie-banner", ".privacy-preference"]
     )
 
-    # Second-layer crawl config (extract article content)
+    # Second-layer crawl config (extract article content). The wait condition
+    # is filled in per domain from the learned settle times, see crawl2.
     depth2_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
-        stream=False,
+        stream=stream,
         extraction_strategy=llm_strategy,
         excluded_tags=["header", "footer", "form", "nav", ".cookie-banner", ".privacy-preference"],
         remove_overlay_elements=True,
         scan_full_page=True,
-        delay_before_return_html=5.0,
+        delay_before_return_html=0.1,
+    )
+
+    # Depth-2 config for pages already fetched over HTTP: extraction only
+    static_config = depth2_config.clone(
+        remove_overlay_elements=False,
+        scan_full_page=False,
+        delay_before_return_html=0.0,
     )
 
     dispatcher = MemoryAdaptiveDispatcher(
@@ -71,33 +133,32 @@ async def crawl_html(start_urls, targets, nm, desc, max_depth=2, max_concurrent=
     def normalize_url(url):
         return urldefrag(url)[0]
 
-    # Crawl depth 2: article pages
-    async def crawl2(article_links, depth2_config, crawler, nm, desc):
-        article_results = await crawler.arun_many(
-            urls=list(article_links),
-            config=depth2_config,
-            dispatcher=None
-        )
+    # Yields results from arun_many whether it streamed or returned a list
+    async def iterate(results):
+        if hasattr(results, "__aiter__"):
+            async for result in results:
+                yield result
+        else:
+            for result in results:
+                yield result
 
+    # Crawl depth 2: article pages. Each result is scored, normalised and
+    # written as soon as it completes, so nothing waits for the whole batch.
+    async def crawl2(article_links, depth2_config, crawler, nm, desc, http_first=False):
         extracted_count = 0
+        saved = []
+        started = time.perf_counter()
+        first_article = None
 
-        def score_content(entry: dict) -> int:
-            # Score based on how complete the entry is
-            score = 0
-            if entry.get("published_date"): score += 3
-            if entry.get("product"): score += 2
-            if entry.get("target"): score += 2
-            if entry.get("summary") and len(entry.get("summary")) > 30: score += 1
-            if entry.get("headline") and len(entry.get("headline")) > 10: score += 1
-            return score
-
-        for result in article_results:
+        async def handle_result(result):
+            nonlocal extracted_count, first_article
             norm_url = normalize_url(result.url)
             visited.add(norm_url)
 
             if result.success:
                 if result.extracted_content:
                     extracted_count += 1
+                    incr("articles_extracted", crawler="html")
                     content = result.extracted_content
                     if isinstance(content, str):
                         content = json.loads(content)
@@ -108,39 +169,141 @@ async def crawl_html(start_urls, targets, nm, desc, max_depth=2, max_concurrent=
                     if not isinstance(content, dict):
                         raise ValueError("Extracted content is not a dictionary")
 
-                    article_data = {
-                        "datetime": datetime.now(timezone.utc).isoformat(),
-                        "url": result.url,
-                        "published_date": content.get("published_date", ""),
-                        "headline": content.get("headline", ""),
-                        "product": content.get("product", ""),
-                        "target": content.get("target", ""),
-                        "description": result.markdown,
-                        "web_name": nm,
-                        "web_desc": desc
-                    }
-
-                    # Save to JSONL
-                    with open("extracted_articles.json", "a", encoding="utf-8") as f:
-                        f.write(json.dumps(article_data, ensure_ascii=False) + "\n")
+                    page_fp = fingerprint(result.markdown)
+                    if seen_store is not None and seen_store.has_fingerprint(page_fp):
+                        # Same article body already ingested under another URL
+                        print(f"[SKIP] Depth 2 - {result.url}: content already ingested")
+                        incr("articles_skipped", crawler="html", reason="duplicate_content")
+                        seen_store.add(result.url, page_fp)
+                        return
+
+                    # Save to JSONL (buffered by the sink)
+                    await sink.write(article_record(result.url, content, result.markdown, nm, desc))
+                    saved.append((result.url, page_fp))
+                    incr("articles_written", crawler="html")
+                    if first_article is None:
+                        first_article = time.perf_counter() - started
+                        observe("first_article_seconds", first_article, crawler="html")
             else:
                 print(f"[ERROR] Depth 2 - {result.url}: {result.error_message}")
+                incr("page_errors", crawler="html", depth="2")
+
+        # Browser pages get one config per domain, each with its own adaptive
+        # wait, and run in a single arun_many so all domains share one
+        # dispatcher and a slow domain does not hold up the others
+        async def crawl_browser(urls):
+            domain_configs = []
+            for domain in sorted({domain_of(url) for url in urls}):
+                budget_ms = settle_stats.budget_ms(domain)
+                domain_configs.append(depth2_config.clone(
+                    wait_for=settle_stats.wait_condition(domain, content_selector),
+                    wait_for_timeout=budget_ms + 5000,
+                    url_matcher=lambda url, domain=domain: domain_of(url) == domain,
+                ))
+                print(f"Waiting up to {budget_ms}ms for pages on {domain} to settle")
+            browser_results = await crawler.arun_many(
+                urls=urls,
+                config=domain_configs,
+                dispatcher=None
+            )
+            async for result in iterate(browser_results):
+                incr("pages_fetched", crawler="html", path="browser")
+                if result.success:
+                    settle_stats.record(result.url, result.html)
+                await handle_result(result)
+
+        # Pages for the browser arrive on a queue (None ends it) and are crawled
+        # in waves of at least BROWSER_BATCH pages (fewer only at the end), so
+        # every wave keeps the dispatcher's sessions busy
+        browser_queue = asyncio.Queue()
+
+        async def browser_worker():
+            finished = False
+            while not finished:
+                urls = []
+                while not finished and (len(urls) < BROWSER_BATCH or not browser_queue.empty()):
+                    url = await browser_queue.get()
+                    if url is None:
+                        finished = True
+                    else:
+                        urls.append(url)
+                if urls:
+                    await crawl_browser(urls)
+
+        # Statically fetched pages are handed over as raw HTML, so no browser
+        # page is opened. Each page goes to extraction, or to the browser when
+        # the content check fails, as soon as its HTTP fetch completes.
+        async def extract_static(url, html):
+            with span("static_extraction", crawler="html"):
+                result = await crawler.arun(url="raw:" + html, config=static_config)
+            incr("pages_fetched", crawler="html", path="http")
+            result.url = url
+            return result
+
+        async def fetch_http():
+            static_pages = asyncio.Queue(maxsize=max_concurrent)
+
+            async def static_worker():
+                while (page := await static_pages.get()) is not None:
+                    await handle_result(await extract_static(*page))
+
+            workers = [asyncio.ensure_future(static_worker()) for _ in range(max_concurrent)]
+            static = escalated = failed = 0
+            try:
+                async for url, html in iter_static(article_links, concurrency=max_concurrent):
+                    if html and looks_complete(html, **(static_check or {})):
+                        # A worker only stops early on an error; raise it here
+                        # rather than block on a queue nobody reads
+                        await asyncio.gather(*(w for w in workers if w.done()))
+                        await static_pages.put((url, html))
+                        static += 1
+                    else:
+                        await browser_queue.put(url)
+                        escalated += bool(html)
+                        failed += not html
+                for _ in workers:
+                    await static_pages.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for w in workers:
+                    w.cancel()
+                await browser_queue.put(None)
+            print(f"Fetch paths: {static} static HTTP, {escalated + failed} browser "
+                  f"({escalated} escalated by content check, {failed} HTTP failures)")
+
+        if http_first:
+            await asyncio.gather(fetch_http(), browser_worker())
+        else:
+            for url in article_links:
+                browser_queue.put_nowait(url)
+            browser_queue.put_nowait(None)
+            await browser_worker()
+        settle_stats.save()
+
+        # Record only after the articles are on disk so failed pages are retried
+        await sink.flush()
+        if seen_store is not None:
+            sink.record_seen(seen_store, saved)
 
         print(f"\n=== Summary ===")
         print(f"Successfully extracted content from {extracted_count} articles")
+        if first_article is not None:
+            print(f"First article written after {first_article:.1f}s, all done after {time.perf_counter() - started:.1f}s")
+        print(f"Extraction cache: {llm_strategy.cache.stats()}")
 
     visited = set()
 
-    async with AsyncWebCrawler(config=browser_config) as crawler:
+    async with (nullcontext(crawler) if crawler else AsyncWebCrawler(config=browser_config)) as crawler:
         print(f"\n=== Depth 1: Extracting links from selectors ===")
         start_urls_normalized = [normalize_url(url) for url in start_urls]
 
         # Crawl home/section pages
-        results = await crawler.arun_many(
-            urls=start_urls_normalized,
-            config=depth1_config,
-            dispatcher=dispatcher
-        )
+        with span("depth1_fetch", crawler="html"):
+            results = await crawler.arun_many(
+                urls=start_urls_normalized,
+                config=depth1_config,
+                dispatcher=dispatcher
+            )
 
         article_links = set()
 
@@ -149,48 +312,35 @@ async def crawl_html(start_urls, targets, nm, desc, max_depth=2, max_concurrent=
             visited.add(norm_url)
 
             if result.success and result.html:
-                soup = BeautifulSoup(result.html, 'html.parser')
-                found = False
-
                 # Search for article links using CSS selectors
-                for target in targets:
-                    target_element = soup.select(target)
-                    if not target_element:
-                        continue
-                    for element in target_element:
-                        links = element.select('a[href]')
-
-                        for link in links:
-                            href = link['href']
-                            link_text = link.get_text(strip=True)
-
-                            if not href or href.startswith('#') or href.startswith('javascript:'):
-                                continue
-                            if not href.startswith('http'):
-                                href = urljoin(result.url, href)
-
-                            normalized_href = normalize_url(href)
-
-                            # Skip pagination and downloads
-                            if re.search(r"(page=\d+|/page/\d+/?)", normalized_href, re.IGNORECASE):
-                                continue
-                            if re.search(r"\.(pdf|docx?|xlsx?|pptx?|zip|rar)(\?|$)", normalized_href, re.IGNORECASE):
-                                continue
-
-                            if normalized_href not in visited:
-                                article_links.add(normalized_href)
-
-                        found = True
+                with span("link_extraction"):
+                    links, found = extract_links(result.html, result.url, targets, link_rules)
+                for normalized_href in links:
+                    if normalized_href not in visited:
+                        article_links.add(normalized_href)
 
                 if not found:
                     print(f"No selectors matched in {result.url}")
             else:
                 print(f"[ERROR] Depth 1 - {result.url}")
+                incr("page_errors", crawler="html", depth="1")
+
+        # Drop articles already ingested by earlier runs
+        if seen_store is not None and article_links:
+            new_links = set(seen_store.filter_new(article_links))
+            print(f"Skipping {len(article_links) - len(new_links)} already ingested article links")
+            incr("articles_skipped", len(article_links) - len(new_links), crawler="html", reason="seen_url")
+            article_links = new_links
 
         # Proceed to article crawling if applicable
         if article_links and max_depth >= 2:
             print(f"\n=== Depth 2: Extracting articles with LLM ===")
             print(f"Processing {len(article_links)} article links")
-            await crawl2(article_links, depth2_config, crawler, nm, desc)
+
+            with span("depth2", crawler="html"):
+                await crawl2(article_links, depth2_config, crawler, nm, desc, http_first)
         else:
             print("No article links found or max_depth < 2")
+
+    if own_sink:
+        await sink.close()
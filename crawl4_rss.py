@@ -5,13 +5,19 @@ from crawl4ai import (
     MemoryAdaptiveDispatcher, LLMConfig
 )
 import re
-from crawl4ai.extraction_strategy import LLMExtractionStrategy
+from extraction_cache import CachedLLMExtractionStrategy
+from content_prune import DEFAULT_TOKEN_BUDGET
+from local_extract import Gazetteer
 from pydantic import BaseModel
 from bs4 import BeautifulSoup
-import feedparser
 import os
 import json
+from contextlib import nullcontext
 from crawl4ai import RateLimiter
+from seen_store import fingerprint
+from feed_fetcher import FeedState, commit_entries, entry_key, fetch_feeds
+from article_sink import ArticleSink, article_record
+from metrics import incr, span
 
 
 
@@ -27,7 +33,20 @@ class ArticleData(BaseModel):
 
 
 
-async def crawl_rss(rss_urls,max_concurrent=10):
+# Pass a SeenStore to skip articles ingested by previous runs, an
+# ExtractionCache to reuse LLM results for unchanged pages, a running
+# AsyncWebCrawler to share one browser across sources and a FeedState to
+# keep conditional-GET validators between runs. Articles go to `sink` (an
+# ArticleSink shared across sources, by default one writing extracted_articles.json),
+# tagged with the web source name `nm` and description `desc`. A
+# NearDuplicateIndex (`dedup`) lets syndicated copies skip the LLM. Pages are
+# pruned to `token_budget` tokens of article text before extraction (None: off).
+# The products to recognise come from `gazetteer` (default: gazetteer.json).
+# `local_extraction` (off by default) takes the fields found with confidence
+# in the page itself and asks the LLM only for the rest.
+async def crawl_rss(rss_urls,max_concurrent=10, seen_store=None, extraction_cache=None, crawler=None,
+                    feed_state=None, sink=None, nm="", desc="", dedup=None, token_budget=DEFAULT_TOKEN_BUDGET,
+                    gazetteer=None, local_extraction=False):
     browser_config = BrowserConfig(headless=True, verbose=False)
 
 
@@ -41,34 +60,31 @@ async def crawl_rss(rss_urls,max_concurrent=10):
             max_retries=2
         )
     )
-    # LLM strategy for depth 2 (article extraction)
-    llm_strategy = LLMExtractionStrategy(
+    if gazetteer is None:
+        gazetteer = Gazetteer.from_file()
+    products = gazetteer.describe().replace("\n", "\n            ")
+
+    # LLM strategy for depth 2 (article extraction), cached on page content
+    llm_strategy = CachedLLMExtractionStrategy(
+        cache=extraction_cache,
+        dedup=dedup,
+        token_budget=token_budget,
+        prune_keywords=gazetteer.keywords(),
+        gazetteer=gazetteer if local_extraction else None,
+        exhaustive_products=True,
         llm_config=LLMConfig(
             provider="gemini/gemini-2.0-flash",
             api_token="Your-Gemini-API-Key-Here",
         ),
         schema=ArticleData.model_json_schema(),
         extraction_type="schema",
-        instruction=""" Extract 'headline' and a short 'summary' from the content.
+        instruction=f""" Extract 'headline' and a short 'summary' from the content.
         Get the 'published_date' from the content such that it had date,month and year. Check throughly near the headline.
 
         **IMPORTANT**: Answer only from the provided content, DO NOT make up any information or try to come up with an example.
 
         List of products and targets that should be recognized:
-            'BCG Tice': 'Bacterial immunopotentiator',
-            'Adstiladrin': 'Non-replicating AAV with IFN alpha2b gene',
-            'Vicineum': 'Anti-ECAM exotoxin A fusion protein',
-            'Keytruda': 'Anti-PD-1 mAb',
-            'Pembrolizumab': 'Anti-PD-1 mAb',
-            'UGN-102': 'D- synthesis inhibitor',
-            'CG0070 + Keytruda': 'Oncolytic adenovirus immunotherapy + Anti-PD-1 mAb',
-            'VesAnktiva + BCG': 'IL-15 superagonist fusion protein',
-            'EG-70': 'IL-12 non-viral gene therapy',
-            'Erdafitinib': 'FGFR inhibitor',
-            'TAR-200': 'Gemcitabine-releasing intravesical system',
-            'TLD-1433': 'Ruthenium-based photosensitizer',
-            'Enfortumab Vedotin': 'Nectin-4-directed',
-            'TARA-002': 'TLR-4 agonists'
+            {products}
         if any of these products or targets are mentioned in the article, extract them.
         If the article does not mention any of these products or targets, return an empty string for those fields.
         
@@ -80,9 +96,10 @@ async def crawl_rss(rss_urls,max_concurrent=10):
     
     # Config for depth 2 (LLM extraction from articles)
     
+    # Streamed: each article is handled as soon as its page is extracted
     depth2_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
-        stream=False,
+        stream=True,
         extraction_strategy=llm_strategy,
         excluded_tags=['form', 'footer', 'nav'],
     )
@@ -93,7 +110,7 @@ async def crawl_rss(rss_urls,max_concurrent=10):
     
     async def crawl2(article_links, depth2_config, crawler):
         article_results = await crawler.arun_many(
-            urls=list(article_links)[5],
+            urls=list(article_links),
             config=depth2_config,
             dispatcher=dispatcher
         )
@@ -103,7 +120,9 @@ async def crawl_rss(rss_urls,max_concurrent=10):
 
 
         extracted_count = 0
-        for result in article_results:
+        saved = []
+        async for result in article_results:
+            incr("pages_fetched", crawler="rss", path="browser")
             norm_url = normalize_url(result.url)
             visited.add(norm_url)
 
@@ -135,13 +154,12 @@ async def crawl_rss(rss_urls,max_concurrent=10):
                         # Use the first valid extraction
                         extracted_content = valid_extractions[0]
                         extracted_count += 1
+                        incr("articles_written", crawler="rss")
                         
-                        # Save results to file
-                        with open("extracted_articles.txt", "w", encoding="utf-8") as f:
-                            f.write(f"URL: {result.url}\n")
-                            f.write("Extracted:\n")
-                            f.write(f"{extracted_content}\n")
-                            f.write("-" * 80 + "\n\n")
+                        # Save results as JSONL (buffered by the sink)
+                        await sink.write(article_record(result.url, extracted_content, result.markdown, nm, desc))
+                        saved.append((result.url, fingerprint(result.markdown)))
+                        written.add(norm_url)
                             
                     else:
                         print(f"No valid content extracted from {result.url}")
@@ -149,21 +167,60 @@ async def crawl_rss(rss_urls,max_concurrent=10):
                     print(f"No content extracted from {result.url}")
             else:
                 print(f"[ERROR] Depth 2 - {result.url}: {result.error_message}")
+                incr("page_errors", crawler="rss", depth="2")
+
+        # Record only after the articles are on disk so failed pages are retried
+        await sink.flush()
+        if seen_store is not None:
+            sink.record_seen(seen_store, saved)
 
         print(f"\n=== Summary ===")
         print(f"Successfully extracted content from {extracted_count} articles")
+        print(f"Extraction cache: {llm_strategy.cache.stats()}")
 
 
     visited = set()
-    
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-    
-        feed = feedparser.parse(rss_urls[0]) 
-        l=[]
-        for entry in feed.entries:
-            link = entry.get("link", "No Link")   
-            l.append(link)
-
-        await crawl2(l, depth2_config, crawler)         
+    # Entry links written to the sink or already ingested; only these advance the feeds
+    written = set()
+
+    # Pull every feed concurrently; unchanged feeds answer 304 and only
+    # entries newer than the previous run are returned
+    if feed_state is None:
+        feed_state = FeedState()
+    with span("feed_fetch", crawler="rss"):
+        feeds = await fetch_feeds(rss_urls, feed_state)
+
+    l=[]
+    for entries, _ in feeds.values():
+        for entry in entries:
+            link = entry.get("link")
+            if link:
+                l.append(link)
+
+    if seen_store is not None:
+        new_links = seen_store.filter_new(l)
+        written.update(normalize_url(link) for link in set(l) - set(new_links))
+        print(f"Skipping {len(l) - len(new_links)} already ingested article links")
+        incr("articles_skipped", len(l) - len(new_links), crawler="rss", reason="seen_url")
+        l = new_links
+
+    if l:
+        own_sink = sink is None
+        if own_sink:
+            sink = ArticleSink("extracted_articles.json")
+        async with (nullcontext(crawler) if crawler else AsyncWebCrawler(config=browser_config)) as crawler:
+            with span("depth2", crawler="rss"):
+                await crawl2(l, depth2_config, crawler)
+        if own_sink:
+            await sink.close()
+    else:
+        print("No new feed entries")
+
+    # Only advance the feed watermarks past entries that were written, so
+    # failed pages come back on the next run
+    for url, (entries, watermark) in feeds.items():
+        done = {entry_key(e) for e in entries if not e.get("link") or normalize_url(e["link"]) in written}
+        commit_entries(feed_state.get(url), watermark, done)
+    feed_state.save()         
      
         
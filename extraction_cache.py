@@ -0,0 +1,235 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from crawl4ai.config import DEFAULT_PROVIDER
+from crawl4ai.extraction_strategy import LLMExtractionStrategy
+
+from content_prune import DEFAULT_TOKEN_BUDGET, prune
+from local_extract import RULES_VERSION, extract_local
+from metrics import incr, span
+
+
+def cache_key(markdown, schema, instruction, model):
+    # Whitespace differences in the page markdown do not change the key
+    digest = hashlib.sha256()
+    for part in (
+        " ".join(markdown.split()),
+        json.dumps(schema, sort_keys=True),
+        instruction.strip(),
+        model,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# === Extraction Cache ===
+# Size-bounded LRU store of LLM extraction results, persisted in SQLite so
+# byte-identical pages are never sent to the model twice across runs.
+class ExtractionCache:
+    def __init__(self, path="extraction_cache.db", max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                last_used REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions(last_used)")
+        self.conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                incr("extraction_cache_lookups", result="miss")
+                return None
+            self.hits += 1
+            incr("extraction_cache_lookups", result="hit")
+            self.conn.execute(
+                "UPDATE extractions SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            # Evict least recently used entries beyond the size bound
+            self.conn.execute("""
+                DELETE FROM extractions WHERE key IN (
+                    SELECT key FROM extractions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self.conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def mark_duplicate(blocks, canonical):
+    return [dict(b, duplicate_of=canonical) if isinstance(b, dict) else b for b in blocks]
+
+
+def merge_local(blocks, fields, keep_model_product=False):
+    # Fields found locally take precedence over what the model returned,
+    # except a product (and its target) the model named when `keep_model_product`
+    merged = []
+    for b in blocks:
+        if isinstance(b, dict) and not b.get("error"):
+            local = fields
+            if keep_model_product and b.get("product"):
+                local = {k: v for k, v in fields.items() if k not in ("product", "target")}
+            b = dict(b, **local)
+        merged.append(b)
+    return merged
+
+
+# LLMExtractionStrategy that answers from the cache before calling the model.
+# Only successful extractions are stored so failures are retried next time.
+# With a NearDuplicateIndex (`dedup`), syndicated copies of an article seen
+# earlier reuse the canonical article's cached fields instead of calling the
+# model, and those blocks carry `duplicate_of` (the canonical link). A copy
+# whose canonical is not cached is extracted as an article of its own.
+# Pages are pruned to the article region within `token_budget` tokens before
+# the cache key is computed (None sends the whole page); `prune_keywords`
+# (e.g. Gazetteer.keywords()) are kept ahead of the rest of the body (see
+# content_prune.prune).
+# With a Gazetteer, headline, date, summary and product / target are first
+# looked for in the page itself (local_extract.extract_local); the model is
+# skipped when all of them are found and otherwise asked for the missing
+# fields only. `exhaustive_products` means the gazetteer lists every product
+# to extract, so pages without a match get empty product / target locally;
+# without it, a product the model names is never replaced by the local one.
+class CachedLLMExtractionStrategy(LLMExtractionStrategy):
+    # The deprecated provider arguments are spelled out because the base class
+    # validates attribute writes against the defaults in this signature
+    def __init__(self, *args, cache=None, dedup=None, token_budget=DEFAULT_TOKEN_BUDGET, prune_keywords=(),
+                 gazetteer=None, exhaustive_products=False, provider=DEFAULT_PROVIDER, api_token=None,
+                 base_url=None, api_base=None, **kwargs):
+        super().__init__(*args, provider=provider, api_token=api_token, base_url=base_url,
+                         api_base=api_base, **kwargs)
+        self.cache = cache if cache is not None else ExtractionCache()
+        self.dedup = dedup
+        self.token_budget = token_budget
+        self.prune_keywords = tuple(prune_keywords)
+        self.gazetteer = gazetteer
+        self.exhaustive_products = exhaustive_products
+        self._partial = {}
+        self._partial_lock = threading.Lock()
+
+    def _partial_strategy(self, missing):
+        # Copy of this strategy whose schema asks for the `missing` fields only.
+        # Token usage stays shared with this strategy.
+        properties = (self.schema or {}).get("properties")
+        if not properties:
+            return None
+        key = tuple(missing)
+        with self._partial_lock:
+            partial = self._partial.get(key)
+            if partial is None:
+                partial = copy.copy(self)
+                partial.schema = dict(
+                    self.schema,
+                    properties={k: v for k, v in properties.items() if k in missing},
+                    required=[k for k in self.schema.get("required", []) if k in missing],
+                )
+                partial.instruction = (self.instruction or "") + f"\nOnly extract these fields: {', '.join(missing)}."
+                self._partial[key] = partial
+        return partial
+
+    def _extract(self, strategy, url, sections):
+        usage = getattr(self, "total_usage", None)
+        before = (getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+        with span("llm_extraction"):
+            blocks = LLMExtractionStrategy.run(strategy, url, sections)
+        incr("llm_calls")
+        if usage is not None:
+            # Approximate under concurrent runs; total_usage is shared by the strategy
+            incr("llm_tokens", usage.prompt_tokens - before[0], kind="prompt")
+            incr("llm_tokens", usage.completion_tokens - before[1], kind="completion")
+        return blocks
+
+    def run(self, url, sections):
+        # Near-duplicates are signed on the whole page, the same text the graph
+        # loader checks (the record's description), not on the pruned prompt
+        page = "\n".join(sections)
+        if self.token_budget is not None:
+            pruned = prune(sections, self.token_budget, self.prune_keywords)
+            incr("pages_pruned")
+            incr("content_tokens", pruned.tokens_before, kind="page")
+            incr("content_tokens", pruned.tokens_after, kind="sent")
+            if pruned.keywords_dropped:
+                # Product mentions cut by the budget; the model cannot extract them
+                incr("pages_pruned_keywords_dropped")
+            if self.verbose:
+                print(f"[PRUNE] {url}: {pruned.tokens_before} -> {pruned.tokens_after} tokens ({pruned.saved} saved)")
+            sections = [pruned.text]
+        markdown = "\n".join(sections)
+        instruction = self.instruction or ""
+        if self.gazetteer is not None:
+            # Locally found fields depend on the gazetteer as much as on the page
+            instruction += f"\x00gazetteer:{self.gazetteer.version}:{RULES_VERSION}"
+        key = cache_key(
+            markdown,
+            self.schema,
+            instruction,
+            getattr(self.llm_config, "provider", ""),
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        canonical = self.dedup.find(url, page) if self.dedup is not None else None
+        if canonical is not None:
+            incr("near_duplicates", stage="extraction")
+            canonical_blocks = self.cache.get(canonical[1]) if canonical[1] else None
+            if canonical_blocks is not None:
+                return mark_duplicate(canonical_blocks, canonical[0])
+
+        local = None
+        if self.gazetteer is not None:
+            local = extract_local(markdown, self.gazetteer, self.exhaustive_products)
+            incr("local_extractions", result="complete" if not local.missing else "partial")
+
+        if local is not None and not local.missing:
+            blocks = [dict(local.fields, index=0, error=False)]
+        elif local is not None:
+            partial = self._partial_strategy(local.missing) or self
+            blocks = merge_local(self._extract(partial, url, sections), local.fields,
+                                 keep_model_product=not self.exhaustive_products)
+        else:
+            blocks = self._extract(self, url, sections)
+        if blocks and not any(isinstance(b, dict) and b.get("error") for b in blocks):
+            self.cache.put(key, blocks)
+            # Canonical only once its blocks are cached, so copies never find
+            # a canonical they cannot reuse
+            if self.dedup is not None and canonical is None:
+                self.dedup.register(url, page, key)
+        return blocks
@@ -0,0 +1,133 @@
+import asyncio
+import calendar
+import json
+import logging
+import os
+
+import aiohttp
+import feedparser
+
+logger = logging.getLogger(__name__)
+
+# Entry ids remembered per feed to catch undated or same-second entries
+MAX_SEEN_IDS = 500
+
+
+# === Feed State ===
+# ETag / Last-Modified validators and the newest entry seen for every feed,
+# kept between runs so unchanged feeds cost a single 304 round trip.
+class FeedState:
+    def __init__(self, path="feed_state.json"):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.feeds = json.load(f)
+        except FileNotFoundError:
+            self.feeds = {}
+
+    def get(self, url):
+        return self.feeds.setdefault(url, {})
+
+    def save(self):
+        # Write-then-rename so a crash never leaves a half-written state file
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.feeds, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def entry_timestamp(entry):
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    return calendar.timegm(parsed) if parsed else None
+
+
+def entry_key(entry):
+    return entry.get("id") or entry.get("link")
+
+
+def new_entries(entries, feed_state):
+    # Entries newer than the last run, and the watermark they would move the
+    # feed to ({entry id: timestamp}). feed_state itself is only advanced by
+    # commit_entries, once the entries have been written.
+    last_ts = feed_state.get("last_entry", 0)
+    seen_ids = set(feed_state.get("seen_ids", []))
+    fresh, pending = [], {}
+    for entry in entries:
+        entry_id = entry_key(entry)
+        ts = entry_timestamp(entry)
+        if entry_id in seen_ids or entry_id in pending or (ts is not None and ts < last_ts):
+            continue
+        fresh.append(entry)
+        pending[entry_id] = ts
+    return fresh, pending
+
+
+def commit_entries(feed_state, watermark, done):
+    # Advances a feed past the entries whose ids are in `done`. Entries not
+    # done hold the timestamp watermark at or below their own, and the old
+    # validators are kept, so the next run fetches and returns them again.
+    if not watermark:
+        return
+    pending = watermark["entries"]
+    finished = [entry_id for entry_id in pending if entry_id in done]
+    left = [ts for entry_id, ts in pending.items() if entry_id not in done]
+
+    timestamps = [pending[entry_id] for entry_id in finished if pending[entry_id] is not None]
+    last_ts = max([feed_state.get("last_entry", 0)] + timestamps)
+    held = [ts for ts in left if ts is not None]
+    if held:
+        last_ts = min(last_ts, min(held))
+    feed_state["last_entry"] = last_ts
+    feed_state["seen_ids"] = (finished + feed_state.get("seen_ids", []))[:MAX_SEEN_IDS]
+    if not left:
+        if watermark.get("etag"):
+            feed_state["etag"] = watermark["etag"]
+        if watermark.get("modified"):
+            feed_state["modified"] = watermark["modified"]
+
+
+async def fetch_feed(session, url, state):
+    feed_state = state.get(url)
+    headers = {}
+    if feed_state.get("etag"):
+        headers["If-None-Match"] = feed_state["etag"]
+    if feed_state.get("modified"):
+        headers["If-Modified-Since"] = feed_state["modified"]
+
+    async with session.get(url, headers=headers) as resp:
+        if resp.status == 304:
+            return [], None
+        resp.raise_for_status()
+        body = await resp.read()
+        etag = resp.headers.get("ETag")
+        modified = resp.headers.get("Last-Modified")
+
+    # feedparser is synchronous; keep it off the event loop
+    feed = await asyncio.to_thread(feedparser.parse, body)
+    entries, pending = new_entries(feed.entries, feed_state)
+    return entries, {"entries": pending, "etag": etag, "modified": modified}
+
+
+# Fetches all feeds concurrently and returns {feed_url: (new entries, watermark)}.
+# Nothing is recorded yet: pass each watermark to commit_entries with the ids
+# of the entries that were written, then call state.save().
+async def fetch_feeds(urls, state, concurrency=20, timeout=30):
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        results = await asyncio.gather(
+            *(fetch_feed(session, url, state) for url in urls),
+            return_exceptions=True,
+        )
+
+    feeds = {}
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to fetch feed {url}: {result}")
+            feeds[url] = ([], None)
+        else:
+            logger.info(f"Feed {url}: {len(result[0])} new entries")
+            feeds[url] = result
+    return feeds
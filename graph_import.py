@@ -0,0 +1,211 @@
+import argparse
+import csv
+import json
+import logging
+import os
+from collections import defaultdict
+
+from json_to_graph import BATCH_SIZE, article_params, bump_watermark, ensure_schema, iter_articles, store_bodies
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One CSV per node label / relationship type, with neo4j-admin import headers
+NODE_FILES = {
+    "WebSource": ("websources.csv", ["id:ID(WebSource)", "description"]),
+    "Content": ("contents.csv", ["link:ID(Content)", "title", "description", "published_date",
+                                 "audit_insrt:datetime", "content_hash", "alt_links:string[]",
+                                 "body_hash", "body_offset:long", "body_length:long"]),
+    "Product": ("products.csv", ["name:ID(Product)"]),
+    "Target": ("targets.csv", ["name:ID(Target)"]),
+}
+RELATIONSHIP_FILES = {
+    "PUBLISHED": ("published.csv", [":START_ID(WebSource)", ":END_ID(Content)"]),
+    "HAS": ("has.csv", [":START_ID(Content)", ":END_ID(Product)"]),
+    "FOR": ("for.csv", [":START_ID(Product)", ":END_ID(Target)"]),
+}
+MANIFEST = "counts.json"
+
+
+# === CSV Export ===
+# Converts article files into deduplicated node / relationship CSVs for
+# `neo4j-admin database import`. Content is keyed on the same normalized link
+# as the transactional loader and, like it, the last version of an article wins.
+# Articles tagged `duplicate_of` an exported article are folded into it: a
+# PUBLISHED link from their source and an entry in its alt_links. With a
+# BlobStore, bodies are stored there in batches as in the loaders and
+# contents.csv carries the summary plus the body's hash / offset / length.
+def export_csv(paths, out_dir, blob_store=None):
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Pass 1: position of the last record for every Content key
+    last_seen = {}
+    canonical_of = {}
+    position = 0
+    for path in paths:
+        for row in iter_articles(path):
+            params = article_params(row)
+            last_seen[params["link"]] = position
+            if params["canonical"]:
+                canonical_of[params["link"]] = params["canonical"]
+            else:
+                canonical_of.pop(params["link"], None)
+            position += 1
+
+    alt_links = defaultdict(list)
+    for link, canonical in list(canonical_of.items()):
+        if canonical in last_seen and canonical not in canonical_of:
+            alt_links[canonical].append(link)
+        else:
+            # Canonical article missing from the export: keep the copy as its own node
+            del canonical_of[link]
+
+    files, writers = {}, {}
+    for name, (filename, header) in {**NODE_FILES, **RELATIONSHIP_FILES}.items():
+        files[name] = open(os.path.join(out_dir, filename), "w", encoding="utf-8", newline="")
+        writers[name] = csv.writer(files[name])
+        writers[name].writerow(header)
+
+    seen = {name: set() for name in ("WebSource", "Product", "Target", "FOR", "PUBLISHED")}
+    counts = {name: 0 for name in {**NODE_FILES, **RELATIONSHIP_FILES}}
+
+    def write_once(name, key, row):
+        if key in seen[name]:
+            return
+        seen[name].add(key)
+        writers[name].writerow(row)
+        counts[name] += 1
+
+    def write_article(params):
+        write_once("WebSource", params["web_name"], [params["web_name"], params["web_desc"]])
+        if params["link"] in canonical_of:
+            canonical = canonical_of[params["link"]]
+            write_once("PUBLISHED", (params["web_name"], canonical), [params["web_name"], canonical])
+            return
+
+        writers["Content"].writerow([
+            params["link"], params["title"], params["desc"], params["pub_date"],
+            params["audit"], params["content_hash"], ";".join(alt_links.get(params["link"], [])),
+            params["body_hash"] or "", params["body_offset"] if params["body_offset"] is not None else "",
+            params["body_length"] if params["body_length"] is not None else "",
+        ])
+        counts["Content"] += 1
+        write_once("PUBLISHED", (params["web_name"], params["link"]), [params["web_name"], params["link"]])
+
+        if params["product"]:
+            write_once("Product", params["product"], [params["product"]])
+            writers["HAS"].writerow([params["link"], params["product"]])
+            counts["HAS"] += 1
+            if params["target"]:
+                write_once("Target", params["target"], [params["target"]])
+                write_once("FOR", (params["product"], params["target"]),
+                           [params["product"], params["target"]])
+
+    def flush(batch):
+        params = [p for p, _ in batch]
+        if blob_store is not None:
+            store_bodies(params, [row for _, row in batch], blob_store)
+        for p in params:
+            write_article(p)
+        batch.clear()
+
+    # Pass 2: stream the articles again and write each entity once
+    try:
+        position = 0
+        batch = []
+        for path in paths:
+            for row in iter_articles(path):
+                params = article_params(row)
+                current = position
+                position += 1
+                if last_seen[params["link"]] != current:
+                    continue
+                batch.append((params, row))
+                if len(batch) >= BATCH_SIZE:
+                    flush(batch)
+        flush(batch)
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(counts, f, indent=2)
+    logger.info(f"Exported {counts} to {out_dir}")
+    return counts
+
+
+def import_command(out_dir, database="neo4j"):
+    args = ["neo4j-admin", "database", "import", "full", database,
+            "--overwrite-destination", "--multiline-fields=true"]
+    for label, (filename, _) in NODE_FILES.items():
+        args.append(f"--nodes={label}={os.path.join(out_dir, filename)}")
+    for rel_type, (filename, _) in RELATIONSHIP_FILES.items():
+        args.append(f"--relationships={rel_type}={os.path.join(out_dir, filename)}")
+    return " ".join(args)
+
+
+# === Verification ===
+# Compares live node / relationship counts with the export manifest. On
+# success the loader's constraints are created and the ingestion watermark is
+# bumped so QA services drop caches built on the old graph.
+def verify(driver, out_dir, database="neo4j"):
+    with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    actual = {}
+    with driver.session(database=database) as session:
+        for label in NODE_FILES:
+            actual[label] = session.run(f"MATCH (n:`{label}`) RETURN count(n) AS n").single()["n"]
+        for rel_type in RELATIONSHIP_FILES:
+            actual[rel_type] = session.run(f"MATCH ()-[r:`{rel_type}`]->() RETURN count(r) AS n").single()["n"]
+
+    ok = True
+    for name, count in expected.items():
+        status = "ok" if actual.get(name) == count else "MISMATCH"
+        ok = ok and status == "ok"
+        print(f"{name:<10} expected {count:>10}  actual {actual.get(name, 0):>10}  {status}")
+
+    if ok:
+        ensure_schema(driver, database)
+        bump_watermark(expected["Content"])
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline bulk import of crawled articles into Neo4j")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="write neo4j-admin import CSVs")
+    export_parser.add_argument("articles", nargs="+", help="JSONL or JSON array article files")
+    export_parser.add_argument("--out", default="import", help="output directory")
+    export_parser.add_argument("--bodies", help="blob store directory for article bodies (e.g. bodies)")
+
+    verify_parser = sub.add_parser("verify", help="compare imported counts with the export")
+    verify_parser.add_argument("--out", default="import", help="directory holding counts.json")
+    verify_parser.add_argument("--database", default="neo4j")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        if args.bodies:
+            from blob_store import BlobStore
+
+            blob_store = BlobStore(args.bodies)
+            try:
+                export_csv(args.articles, args.out, blob_store)
+            finally:
+                blob_store.close()
+        else:
+            export_csv(args.articles, args.out)
+        print("Stop the database, then run:")
+        print(import_command(args.out))
+    else:
+        from neo4j import GraphDatabase
+
+        driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            auth=(os.getenv("NEO4J_USERNAME", ""), os.getenv("NEO4J_PASSWORD", "")),
+        )
+        try:
+            raise SystemExit(0 if verify(driver, args.out, args.database) else 1)
+        finally:
+            driver.close()
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# Default static-HTML check: enough visible text to be a real article
+DEFAULT_MIN_TEXT_CHARS = 1500
+
+# Phrases served by JavaScript-only shells instead of the article
+JS_SHELL_MARKERS = ("enable javascript", "javascript is disabled", "please turn on javascript")
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+}
+
+
+# Fetches pages over one pooled HTTP session and yields (url, html) as each
+# one arrives, with None for pages that failed or were not HTML. At most
+# `concurrency` requests are in flight and at most as many fetched pages wait
+# for the consumer, so memory does not grow with the number of URLs.
+async def iter_static(urls, concurrency=10, timeout=20, headers=None):
+    urls = list(urls)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=client_timeout,
+        headers=headers or DEFAULT_HEADERS,
+    ) as session:
+
+        async def fetch(url):
+            try:
+                async with session.get(url) as resp:
+                    if resp.status != 200 or "html" not in resp.headers.get("Content-Type", ""):
+                        return None
+                    return await resp.text(errors="replace")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.info(f"Static fetch failed for {url}: {e}")
+                return None
+
+        fetched = asyncio.Queue(maxsize=concurrency)
+        pending = iter(urls)
+
+        async def worker():
+            for url in pending:
+                await fetched.put((url, await fetch(url)))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(urls)))]
+        try:
+            for _ in range(len(urls)):
+                yield await fetched.get()
+        finally:
+            for w in workers:
+                w.cancel()
+
+
+# Fetches all pages; returns {url: html}, with None for failed pages
+async def fetch_static(urls, concurrency=10, timeout=20, headers=None):
+    return {url: html async for url, html in iter_static(urls, concurrency, timeout, headers)}
+
+
+# Heuristic deciding whether static HTML already holds the article.
+# `content_selector` (CSS) narrows the check to the article container;
+# `required_text` lists strings that must appear, e.g. a date label.
+def looks_complete(html, content_selector=None, min_text_chars=DEFAULT_MIN_TEXT_CHARS, required_text=()):
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+
+    root = soup.select_one(content_selector) if content_selector else soup.body
+    if root is None:
+        return False
+
+    text = root.get_text(" ", strip=True)
+    if len(text) < min_text_chars:
+        return False
+    lowered = text.lower()
+    if len(text) < 3 * min_text_chars and any(m in lowered for m in JS_SHELL_MARKERS):
+        return False
+    return all(r.lower() in lowered for r in required_text)
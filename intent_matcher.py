@@ -0,0 +1,185 @@
+import re
+from dataclasses import dataclass
+
+# Canonical query shapes from the Cypher prompt in rag.create_cypher_chain
+LATEST_PER_SOURCE = """
+MATCH (w:WebSource)-[:PUBLISHED]->(c:Content)
+WITH w.id AS web_source, MAX(c.published_date) AS latest_date
+RETURN web_source, latest_date
+"""
+
+PRODUCTS_BY_SOURCE = """
+MATCH (w:WebSource {id: $source})-[:PUBLISHED]->(c:Content)-[:HAS]->(p:Product)
+RETURN DISTINCT p.name AS product_name
+"""
+
+TARGETS_FOR_PRODUCT = """
+MATCH (p:Product {name: $product})-[:FOR]->(t:Target)
+RETURN t.name AS target_name
+"""
+
+MENTION_COUNTS = """
+MATCH (c:Content)-[:HAS]->(p:Product)
+RETURN p.name AS product_name, COUNT(c) AS mentions
+ORDER BY mentions DESC
+"""
+
+MENTION_COUNT_FOR_PRODUCT = """
+MATCH (c:Content)-[:HAS]->(p:Product {name: $product})
+RETURN p.name AS product_name, COUNT(c) AS mentions
+"""
+
+TITLES_BY_TARGET = """
+MATCH (c:Content)-[:HAS]->(:Product)-[:FOR]->(t:Target {name: $target})
+RETURN c.title AS content_title
+"""
+
+TITLES_BY_PRODUCT = """
+MATCH (c:Content)-[:HAS]->(p:Product {name: $product})
+RETURN c.title AS content_title
+"""
+
+# Question shapes, matched against the whole normalized question (lower case,
+# punctuation dropped, entity names replaced by {product} / {target} /
+# {source}). Anything outside a shape, such as a date, a number, "latest" or
+# "not", makes the question fall through to the LLM.
+LEAD = r"(?:(?:please )?(?:can you |could you )?(?:list|show(?: me)?|find|give me|get|retrieve|return|tell me|what are|which are|what is|which|what) )?"
+ALL = r"(?:all )?(?:of )?(?:the )?"
+CONTENT = r"(?:contents?|articles?|press releases?|news(?: items?)?|posts?)"
+TITLES = rf"(?:(?:content |article |news )?(?:titles?|headlines?)(?: of {ALL}{CONTENT})?|{CONTENT})(?: titles)?"
+
+SHAPES = [
+    ("latest_per_source", [
+        rf"{LEAD}{ALL}(?:latest|most recent|newest) (?:published )?(?:{CONTENT}|publications?|publish(?:ed)? dates?)"
+        rf"(?: published)? (?:from|for|by|of|per|on) (?:each|every) (?:web )?source",
+        r"when did each (?:web )?source (?:last|most recently) publish(?: content)?",
+    ]),
+    ("products_by_source", [
+        rf"{LEAD}{ALL}products (?:(?:that are )?(?:mentioned|covered|named|discussed) )?"
+        rf"(?:in {ALL}{CONTENT} )?(?:published )?(?:by|from|in|on) {{source}}",
+        r"(?:which|what) products (?:does|did) {source} (?:mention|cover|publish about)",
+    ]),
+    ("targets_for_product", [
+        rf"{LEAD}{ALL}targets? (?:(?:that are |is )?(?:linked|associated|related|connected) (?:to|with)|of|for) "
+        r"(?:the )?(?:product )?{product}",
+        r"what (?:does|is) (?:the product )?{product} target(?:ing)?",
+    ]),
+    ("mention_counts", [
+        rf"(?:count )?how many {CONTENT} mention each product",
+        rf"{LEAD}{ALL}(?:number|count) of (?:mentions|{CONTENT}) (?:per|for each|of each|by) product",
+        r"how (?:often|many times) is each product mentioned",
+    ]),
+    ("mention_count_product", [
+        rf"(?:count )?how many {CONTENT} mention (?:the product )?{{product}}",
+        rf"{LEAD}{ALL}(?:number|count) of (?:mentions|{CONTENT}) (?:of|for|mentioning) (?:the product )?{{product}}",
+        r"how (?:often|many times) is (?:the product )?{product} mentioned",
+    ]),
+    ("titles_by_target", [
+        rf"{LEAD}{ALL}{TITLES} (?:that |which )?(?:mention|mentioning|about|on|for|related to|linked to)"
+        r"(?: (?:a |the )?(?:specific )?target)? {target}",
+    ]),
+    ("titles_by_product", [
+        rf"{LEAD}{ALL}{TITLES} (?:that |which )?(?:mention|mentioning|about|on|for|related to)"
+        r"(?: (?:the )?product)? {product}",
+    ]),
+]
+SHAPE_PATTERNS = [(name, re.compile("|".join(f"(?:{p})" for p in patterns))) for name, patterns in SHAPES]
+
+PUNCTUATION = re.compile(r"[^\w{}\s]")
+
+CYPHER = {
+    "latest_per_source": LATEST_PER_SOURCE,
+    "products_by_source": PRODUCTS_BY_SOURCE,
+    "targets_for_product": TARGETS_FOR_PRODUCT,
+    "mention_counts": MENTION_COUNTS,
+    "mention_count_product": MENTION_COUNT_FOR_PRODUCT,
+    "titles_by_target": TITLES_BY_TARGET,
+    "titles_by_product": TITLES_BY_PRODUCT,
+}
+
+NO_ANSWER = "The answer is not available based on the data."
+
+
+@dataclass
+class Intent:
+    name: str
+    cypher: str
+    params: dict
+
+    def render(self, rows):
+        # Deterministic answer text for the rows of this intent
+        if not rows:
+            return NO_ANSWER
+        if self.name == "latest_per_source":
+            return "\n".join(f"- {r['web_source']}: {r['latest_date']}" for r in rows)
+        if self.name.startswith("mention_count"):
+            return "\n".join(f"- {r['product_name']}: {r['mentions']} mentions" for r in rows)
+        values = [next(iter(r.values())) for r in rows]
+        return "\n".join(f"- {v}" for v in values)
+
+
+def _name_pattern(names):
+    # Longest names first so "CG0070 + Keytruda" wins over "Keytruda"
+    names = sorted({n for n in names if n}, key=len, reverse=True)
+    if not names:
+        return None
+    alternation = "|".join(re.escape(n) for n in names)
+    return re.compile(rf"(?<!\w)({alternation})(?!\w)", re.IGNORECASE)
+
+
+# === Intent Matcher ===
+# Recognises the question shapes listed in the Cypher prompt together with
+# known Product / Target / WebSource names and emits parameterized Cypher
+# directly, so these questions need no LLM call at all. A question only
+# matches when its whole text fits one shape.
+class IntentMatcher:
+    def __init__(self, products=(), targets=(), sources=()):
+        self.canonical = {}
+        for kind, names in (("product", products), ("target", targets), ("source", sources)):
+            self.canonical[kind] = {n.lower(): n for n in names if n}
+        self.patterns = {
+            kind: _name_pattern(names.values()) for kind, names in self.canonical.items()
+        }
+
+    @classmethod
+    def from_graph(cls, graph):
+        def names(query):
+            return [r["name"] for r in graph.query(query) if r.get("name")]
+
+        return cls(
+            products=names("MATCH (p:Product) RETURN p.name AS name"),
+            targets=names("MATCH (t:Target) RETURN t.name AS name"),
+            sources=names("MATCH (w:WebSource) RETURN w.id AS name"),
+        )
+
+    def normalize(self, question):
+        # (shape text, {kind: [names]}): entity names swapped for placeholders
+        # first, so names keep their own punctuation and digits
+        found = {}
+        for kind in ("product", "target", "source"):
+            pattern = self.patterns[kind]
+            if pattern is None:
+                continue
+
+            def placeholder(m, kind=kind):
+                name = self.canonical[kind][m.group(1).lower()]
+                found.setdefault(kind, [])
+                if name not in found[kind]:
+                    found[kind].append(name)
+                return f" {{{kind}}} "
+
+            question = pattern.sub(placeholder, question)
+        text = " ".join(PUNCTUATION.sub(" ", question.lower()).split())
+        return text, found
+
+    def match(self, question):
+        # Returns an Intent, or None when the question needs the LLM
+        text, found = self.normalize(question)
+        # Several entities of one kind means a question the templates cannot express
+        if any(len(names) > 1 for names in found.values()):
+            return None
+        for name, pattern in SHAPE_PATTERNS:
+            if pattern.fullmatch(text):
+                params = {kind: names[0] for kind, names in found.items()}
+                return Intent(name, CYPHER[name], params)
+        return None
@@ -1,52 +1,632 @@
-def build_graph(tx, articles):
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from urllib.parse import parse_qsl, urldefrag, urlencode, urlsplit, urlunsplit
+
+from blob_store import summarize
+from metrics import incr, span
+
+logger = logging.getLogger(__name__)
+
+# Number of articles sent per UNWIND batch (and committed per transaction)
+BATCH_SIZE = 1000
+
+# Ingestion watermark, bumped whenever new Content is committed. Readers such
+# as rag.py compare versions to know when their schema or caches are stale.
+WATERMARK_PATH = "graph_watermark.json"
+
+# Writer threads for load_articles_parallel
+WRITE_WORKERS = int(os.getenv("GRAPH_WRITE_WORKERS", "4"))
+
+# Attempts per partition on transient errors that outlast the driver's own retries
+MAX_WRITE_ATTEMPTS = 5
+
+# Unique keys backing every MERGE in the loader; created once at startup
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT content_link IF NOT EXISTS FOR (c:Content) REQUIRE c.link IS UNIQUE",
+    "CREATE CONSTRAINT product_name IF NOT EXISTS FOR (p:Product) REQUIRE p.name IS UNIQUE",
+    "CREATE CONSTRAINT target_name IF NOT EXISTS FOR (t:Target) REQUIRE t.name IS UNIQUE",
+    "CREATE CONSTRAINT websource_id IF NOT EXISTS FOR (w:WebSource) REQUIRE w.id IS UNIQUE",
+]
+
+# Content upsert shared by the sequential and the parallel loader. Content is
+# upserted on its normalized link and only rewritten when its content hash
+# changed, so re-crawled articles are skipped. A node still holding its full
+# body is also rewritten once the row's body goes to the blob store. Each
+# loader then replaces the HAS links of the rewritten nodes.
+CONTENT_UPSERT = """
+    UNWIND $rows AS row
+    MERGE (c:Content {link: row.link})
+    WITH c, row
+    WHERE c.content_hash IS NULL OR c.content_hash <> row.content_hash
+       OR (row.body_hash IS NOT NULL AND c.body_hash IS NULL)
+
+    SET c.title = row.title,
+        c.description = row.desc,
+        c.published_date = row.pub_date,
+        c.audit_insrt = datetime(row.audit),
+        c.content_hash = row.content_hash,
+        c.body_hash = row.body_hash,
+        c.body_offset = row.body_offset,
+        c.body_length = row.body_length
+"""
+
+# One round trip per batch: Content, its WebSource and its Product / Target.
+# HAS links from a previous version of a changed article are dropped first.
+ARTICLE_BATCH_QUERY = CONTENT_UPSERT + """
+    WITH c, row
+    CALL {
+        WITH c
+        MATCH (c)-[old:HAS]->(:Product)
+        DELETE old
+    }
+
+    MERGE (w:WebSource {id: row.web_name})
+      ON CREATE SET w.description = row.web_desc
+    MERGE (w)-[:PUBLISHED]->(c)
+
+    // HAS -> Product, FOR -> Target
+    FOREACH (_ IN CASE WHEN row.product <> "" THEN [1] ELSE [] END |
+        MERGE (p:Product {name: row.product})
+        MERGE (c)-[:HAS]->(p)
+        FOREACH (_ IN CASE WHEN row.target <> "" THEN [1] ELSE [] END |
+            MERGE (t:Target {name: row.target})
+            MERGE (p)-[:FOR]->(t)
+        )
+    )
+
+    RETURN count(c) AS written
+"""
+
+# Near-duplicates (syndicated copies) do not get their own Content node: their
+# source gets a PUBLISHED link to the canonical article and their URL is kept
+# in the canonical's alt_links. The canonical node is created from the copy
+# when it has not been loaded (yet); its own record later overwrites the fields.
+DUPLICATE_BATCH_QUERY = """
+    UNWIND $rows AS row
+    MERGE (c:Content {link: row.canonical})
+      ON CREATE SET c.title = row.title,
+        c.description = row.desc,
+        c.published_date = row.pub_date,
+        c.audit_insrt = datetime(row.audit),
+        c.content_hash = row.content_hash,
+        c.body_hash = row.body_hash,
+        c.body_offset = row.body_offset,
+        c.body_length = row.body_length
+
+    MERGE (w:WebSource {id: row.web_name})
+      ON CREATE SET w.description = row.web_desc
+    MERGE (w)-[:PUBLISHED]->(c)
+
+    WITH c, row
+    WHERE NOT row.link IN coalesce(c.alt_links, [])
+    SET c.alt_links = coalesce(c.alt_links, []) + row.link
+    RETURN count(c) AS linked
+"""
+
+# === Parallel Loader Queries ===
+# Shared dimension nodes are upserted once per chunk, single-threaded, so the
+# parallel partitions below only MATCH them and never race on their creation.
+DIMENSION_QUERIES = [
+    """
+    UNWIND $sources AS s
+    MERGE (w:WebSource {id: s.id})
+      ON CREATE SET w.description = s.description
+    """,
+    """
+    UNWIND $products AS name
+    MERGE (:Product {name: name})
+    """,
+    """
+    UNWIND $targets AS name
+    MERGE (:Target {name: name})
+    """,
+    """
+    UNWIND $pairs AS pair
+    MATCH (p:Product {name: pair.product})
+    MATCH (t:Target {name: pair.target})
+    MERGE (p)-[:FOR]->(t)
+    """,
+]
+
+# Partition writes. Content upserts only touch nodes owned by the partition.
+# HAS links of the rewritten articles are then replaced in one pass: stale
+# links are read first (reads take no locks), and the deletes and MERGEs run
+# together in Product name order, so concurrent partitions lock Product nodes
+# in one global order. Links that stay the same are left alone.
+PARTITION_CONTENT_QUERY = CONTENT_UPSERT + """
+    RETURN row.link AS link
+"""
+
+PARTITION_HAS_QUERY = """
+    CALL {
+        UNWIND $rows AS row
+        MATCH (:Content {link: row.link})-[old:HAS]->(p:Product)
+        WHERE p.name <> row.product
+        RETURN p.name AS product, old, null AS link
+        UNION ALL
+        UNWIND $rows AS row
+        WITH row WHERE row.product <> ""
+        RETURN row.product AS product, null AS old, row.link AS link
+    }
+    WITH product, old, link
+    ORDER BY product, link
+    CALL {
+        WITH old
+        WITH old WHERE old IS NOT NULL
+        DELETE old
+    }
+    CALL {
+        WITH product, link
+        WITH product, link WHERE link IS NOT NULL
+        MATCH (p:Product {name: product})
+        MATCH (c:Content {link: link})
+        MERGE (c)-[:HAS]->(p)
+    }
+"""
+
+# Written once per chunk after the partitions, since every article of a source
+# links to the same WebSource node. Covers unchanged rows too (MERGE is a read
+# when the link exists), so a chunk that failed half way is repaired on rerun.
+CHUNK_PUBLISHED_QUERY = """
+    UNWIND $rows AS row
+    MATCH (w:WebSource {id: row.web_name})
+    MATCH (c:Content {link: row.link})
+    MERGE (w)-[:PUBLISHED]->(c)
+"""
+
+# Content nodes loaded before the blob store was enabled, which still hold
+# their full body; see backfill_bodies
+INLINE_BODIES_QUERY = """
+    MATCH (c:Content)
+    WHERE c.body_hash IS NULL AND coalesce(c.description, "") <> ""
+    RETURN c.link AS link, c.description AS body
+    LIMIT $limit
+"""
+
+MOVE_BODIES_QUERY = """
+    UNWIND $rows AS row
+    MATCH (c:Content {link: row.link})
+    WHERE c.body_hash IS NULL
+    SET c.description = row.desc,
+        c.body_hash = row.body_hash,
+        c.body_offset = row.body_offset,
+        c.body_length = row.body_length
+"""
+
+# Query-string parameters that never change the article behind a URL
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def normalize_link(url):
+    # Canonical form of an article URL: no fragment, lower-case host,
+    # no tracking parameters and no trailing slash
+    url = urldefrag(url.strip())[0]
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def content_hash(params):
+    # Fingerprint of every field written to the Content node and its links
+    digest = hashlib.sha256()
+    for key in ("title", "desc", "pub_date", "product", "target", "web_name"):
+        digest.update(params[key].encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# Flatten one crawled article into the parameter map used by the batch query
+def article_params(row):
+    params = {
+        "web_name": row.get('web_name', ""),
+        "web_desc": row.get('web_desc', ""),
+        "title": row.get('headline', ""),
+        "desc": row.get('description', ""),
+        "pub_date": row.get('published_date', ""),
+        "audit": row.get('datetime', "").replace(" ", "T"),
+        "link": normalize_link(row.get('url', "")),
+        "product": row.get('product') or "",
+        "target": row.get('target') or "",
+    }
+    params["content_hash"] = content_hash(params)
+    canonical = normalize_link(row.get("duplicate_of") or "")
+    params["canonical"] = canonical if canonical != params["link"] else ""
+    params["body_hash"] = params["body_offset"] = params["body_length"] = None
+    # Articles without a URL are keyed on their content instead
+    if not params["link"]:
+        params["link"] = "urn:sha256:" + params["content_hash"]
+    return params
+
+
+# With a BlobStore the bodies of a batch are stored there in one write and the
+# node only keeps a summary plus the body's hash / offset / length. The content
+# hash stays computed over the full body.
+def store_bodies(params, articles, blob_store):
+    pairs = [(p, row) for p, row in zip(params, articles) if p["desc"]]
+    stored = blob_store.put_many([p["desc"] for p, _ in pairs])
+    for (p, row), (digest, offset, length) in zip(pairs, stored):
+        p["body_hash"], p["body_offset"], p["body_length"] = digest, offset, length
+        p["desc"] = row.get("summary") or summarize(p["desc"])
+    return params
+
+
+# One-off move of the bodies already in the graph into the blob store, for a
+# graph loaded before the store was enabled: the loaders skip those nodes as
+# long as their articles are unchanged. Nodes keep a summary of their body, as
+# with store_bodies. Returns the number of nodes moved; once none are left the
+# call is a single query.
+def backfill_bodies(driver, blob_store, batch_size=BATCH_SIZE, database="neo4j", watermark_path=WATERMARK_PATH):
+    moved = 0
+    with driver.session(database=database) as session:
+        while True:
+            records = session.execute_read(
+                lambda tx: list(tx.run(INLINE_BODIES_QUERY, {"limit": batch_size}))
+            )
+            if not records:
+                break
+            stored = blob_store.put_many([r["body"] for r in records])
+            rows = [
+                {"link": r["link"], "desc": summarize(r["body"]),
+                 "body_hash": digest, "body_offset": offset, "body_length": length}
+                for r, (digest, offset, length) in zip(records, stored)
+            ]
+            session.execute_write(lambda tx: tx.run(MOVE_BODIES_QUERY, {"rows": rows}).consume())
+            moved += len(rows)
+            logger.info(f"Moved {moved} article bodies from the graph to the blob store")
+            if len(records) < batch_size:
+                break
+    if moved:
+        bump_watermark(moved, watermark_path)
+    return moved
+
+
+def article_rows(articles, blob_store=None):
+    params = [article_params(row) for row in articles]
+    if blob_store is not None:
+        store_bodies(params, articles, blob_store)
+    return params
+
+
+def ensure_schema(driver, database="neo4j"):
+    with driver.session(database=database) as session:
+        for statement in SCHEMA_STATEMENTS:
+            try:
+                session.run(statement).consume()
+            except Exception as e:
+                logger.error(f"Failed to apply schema statement '{statement}': {e}")
+                raise
+    logger.info("Graph constraints and indexes are in place")
+
+
+def build_graph(tx, articles, blob_store=None):
+    # Returns the number of Content nodes created or updated, plus duplicates
+    # newly linked to their canonical article
+    rows = article_rows(articles, blob_store)
+    originals = [r for r in rows if not r["canonical"]]
+    written = 0
+    if originals:
+        record = tx.run(ARTICLE_BATCH_QUERY, {"rows": originals}).single()
+        written = record["written"] if record else 0
+    return written + link_duplicates(tx, [r for r in rows if r["canonical"]])
+
+
+def link_duplicates(tx, rows):
+    if not rows:
+        return 0
+    record = tx.run(DUPLICATE_BATCH_QUERY, {"rows": rows}).single()
+    return record["linked"] if record else 0
+
+
+def mark_duplicates(articles, dedup):
+    # Sets `duplicate_of` on near-copies of articles registered earlier in the
+    # NearDuplicateIndex and registers the rest as canonical
     for row in articles:
-        audit_iso = row.get('datetime', "").replace(" ", "T")
-        pub_date = row.get('published_date', "")
-
-        tx.run("""
-            MERGE (w:WebSource {id: $web_name})
-              ON CREATE SET w.description = $web_desc
-
-            CREATE (c:Content {
-                title: $title,
-                description: $desc,
-                published_date: $pub_date,
-                audit_insrt: datetime($audit),
-                link: $link
-            })
-
-            MERGE (w)-[:PUBLISHED]->(c)
-        """, {
-
-            "web_name": row.get('web_name', ""),
-            "web_desc": row.get('web_desc', ""),
-            "title": row.get('headline', ""),
-            "desc": row.get('description', ""),
-            "pub_date": pub_date,
-            "audit": audit_iso,
-            "link": row.get('url', "")
-        })
-
-        # HAS -> Product
-        if row.get('product'):
-            tx.run("""
-                MERGE (p:Product {name: $product})
-                WITH p
-                MATCH (c:Content {title: $title})
-                MERGE (c)-[:HAS]->(p)
-            """, {
-                "product": row['product'],
-                "title": row['headline']
-            })
-
-        # FOR -> Target
-        if row.get('product') and row.get('target'):
-            tx.run("""
-                MERGE (t:Target {name: $target})
-                WITH t
-                MATCH (p:Product {name: $product})
-                MERGE (p)-[:FOR]->(t)
-            """, {
-                "product": row['product'],
-                "target": row['target']
-            })
+        if row.get("duplicate_of"):
+            continue
+        match = dedup.check(row.get("url", ""), row.get("description", ""))
+        if match is not None:
+            row["duplicate_of"] = match[0]
+            incr("near_duplicates", stage="graph")
+    return articles
+
+
+def batched(iterable, size):
+    # Yield lists of at most `size` items without materialising the whole iterable
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# === Article Reader ===
+# Streams articles from extracted_articles.json. The crawlers append one JSON
+# object per line (JSONL); older files hold a single JSON array. Both are read
+# incrementally so memory does not grow with the file.
+
+READ_CHUNK = 1 << 16
+
+# A decode error this close to the end of the buffer may just be an element
+# cut off by the read (e.g. a number or literal split across chunks)
+INCOMPLETE_SLACK = 64
+
+# Fields that must be strings when present in an article record
+STRING_FIELDS = ("datetime", "url", "published_date", "headline", "product",
+                 "target", "description", "web_name", "web_desc", "duplicate_of")
+
+
+def validate_article(record):
+    if not isinstance(record, dict):
+        return False
+    if not (record.get("url") or record.get("headline")):
+        return False
+    return all(isinstance(record.get(k, ""), str) for k in STRING_FIELDS)
+
+
+def _incomplete(e, buf):
+    # True when the decode error only means the element runs past the end of
+    # the buffer (more of the file is needed), not that it is malformed
+    return e.msg.startswith("Unterminated string") or len(buf) - e.pos <= INCOMPLETE_SLACK
+
+
+def _iter_json_array(f, buf):
+    decoder = json.JSONDecoder()
+    pos = buf.index("[") + 1
+    # Bytes of the file already dropped from the front of `buf`, for errors
+    consumed = 0
+    eof = False
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        if pos < len(buf):
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # A malformed element fails fast; reading on to find its end
+                # would pull the rest of the file into memory
+                if eof or not _incomplete(e, buf):
+                    offset = consumed + len(buf[:e.pos].encode("utf-8"))
+                    raise ValueError(f"Malformed JSON array at byte offset {offset}: {e.msg}")
+            else:
+                yield value
+                pos = end
+                continue
+        elif eof:
+            raise ValueError("Unterminated JSON array")
+        more = f.read(READ_CHUNK)
+        eof = not more
+        consumed += len(buf[:pos].encode("utf-8"))
+        buf = buf[pos:] + more
+        pos = 0
+
+
+def _iter_json_lines(f):
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            # A crash mid-write can leave a truncated line; keep reading the rest
+            logger.warning(f"Skipping malformed line {line_no}: {e}")
+
+
+def iter_articles(path):
+    # Yields validated article dicts one at a time from a JSONL or JSON array file
+    skipped = 0
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(READ_CHUNK)
+        if head.lstrip().startswith("["):
+            records = _iter_json_array(f, head)
+        else:
+            f.seek(0)
+            records = _iter_json_lines(f)
+        for record in records:
+            if validate_article(record):
+                yield record
+            else:
+                skipped += 1
+    if skipped:
+        logger.warning(f"Skipped {skipped} invalid article records in {path}")
+
+
+# === Ingestion Watermark ===
+def read_watermark(path=WATERMARK_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("version", 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_watermark(written, path=WATERMARK_PATH):
+    state = {
+        "version": read_watermark(path) + 1,
+        "written": written,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+    return state["version"]
+
+
+# === Bulk Loader ===
+# Sends articles in chunks of `batch_size`, one transaction per chunk, so a
+# large backfill neither waits on per-row round trips nor builds one huge transaction.
+# With a NearDuplicateIndex (`dedup`), near-copies of earlier articles are
+# linked to the canonical Content instead of getting their own node.
+# Returns the number of new or changed articles written.
+def load_articles(driver, articles, batch_size=BATCH_SIZE, database="neo4j", watermark_path=WATERMARK_PATH,
+                  blob_store=None, dedup=None):
+    total = 0
+    written = 0
+    start = time.perf_counter()
+
+    with driver.session(database=database) as session:
+        for chunk in batched(articles, batch_size):
+            if dedup is not None:
+                chunk = mark_duplicates(chunk, dedup)
+            with span("graph_write"):
+                chunk_written = session.execute_write(build_graph, chunk, blob_store)
+            incr("graph_rows", len(chunk), result="loaded")
+            incr("graph_rows", chunk_written, result="written")
+            if chunk_written:
+                bump_watermark(chunk_written, watermark_path)
+            written += chunk_written
+            total += len(chunk)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded {total} articles, {written} new or changed ({total / elapsed:.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    logger.info(
+        f"Finished loading {total} articles in {elapsed:.2f}s ({rate:.0f} rows/sec), "
+        f"{written} new or changed, {total - written} unchanged"
+    )
+    return written
+
+
+# === Parallel Loader ===
+def upsert_dimensions(tx, rows):
+    sources = {r["web_name"]: r["web_desc"] for r in rows}
+    pairs = {(r["product"], r["target"]) for r in rows if r["product"] and r["target"]}
+    params = {
+        "sources": [{"id": k, "description": v} for k, v in sorted(sources.items())],
+        "products": sorted({r["product"] for r in rows if r["product"]}),
+        "targets": sorted({r["target"] for r in rows if r["target"]}),
+        "pairs": [{"product": p, "target": t} for p, t in sorted(pairs)],
+    }
+    for query in DIMENSION_QUERIES:
+        tx.run(query, params)
+
+
+def write_partition(tx, rows):
+    # Returns the number of Content nodes created or updated
+    changed = {record["link"] for record in tx.run(PARTITION_CONTENT_QUERY, {"rows": rows})}
+    rows = [{"link": r["link"], "product": r["product"]} for r in rows if r["link"] in changed]
+    if rows:
+        tx.run(PARTITION_HAS_QUERY, {"rows": rows})
+    return len(changed)
+
+
+def write_published(tx, rows):
+    tx.run(CHUNK_PUBLISHED_QUERY, {"rows": [{"web_name": r["web_name"], "link": r["link"]} for r in rows]})
+
+
+def latest_per_link(rows):
+    # One row per link, the last one seen, as in the sequential loader where a
+    # later version of an article in the same batch overwrites the earlier
+    latest = {}
+    for row in rows:
+        latest.pop(row["link"], None)
+        latest[row["link"]] = row
+    return list(latest.values())
+
+
+def _write_partition_with_retry(driver, rows, database):
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+    for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+        try:
+            with driver.session(database=database) as session:
+                return session.execute_write(write_partition, rows)
+        except (TransientError, ServiceUnavailable, SessionExpired) as e:
+            if attempt == MAX_WRITE_ATTEMPTS:
+                raise
+            logger.warning(f"Partition write failed (attempt {attempt}), retrying: {e}")
+            incr("graph_write_retries")
+            time.sleep(0.5 * 2 ** attempt)
+
+
+# Multi-worker variant of load_articles. Each chunk of `batch_size * workers`
+# articles first upserts its WebSource / Product / Target nodes once, then is
+# split by Content key into `workers` partitions written concurrently, one
+# session per worker. PUBLISHED links and near-duplicates are written
+# afterwards, in the same thread. The watermark is bumped for every committed
+# partition, so a failure in one does not hide the others' writes. Returns the
+# number of new or changed articles written.
+def load_articles_parallel(driver, articles, workers=WRITE_WORKERS, batch_size=BATCH_SIZE,
+                           database="neo4j", watermark_path=WATERMARK_PATH, blob_store=None, dedup=None):
+    total = 0
+    written = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, driver.session(database=database) as session:
+        for chunk in batched(articles, batch_size * workers):
+            with span("graph_prepare"):
+                if dedup is not None:
+                    chunk = mark_duplicates(chunk, dedup)
+                rows = latest_per_link(article_rows(chunk, blob_store))
+            with span("graph_dimensions"):
+                session.execute_write(upsert_dimensions, rows)
+
+            # A given article always lands in the same partition
+            partitions = [[] for _ in range(workers)]
+            duplicates = []
+            for row in rows:
+                if row["canonical"]:
+                    duplicates.append(row)
+                    continue
+                partitions[zlib.crc32(row["link"].encode("utf-8")) % workers].append(row)
+
+            chunk_written = 0
+            with span("graph_write"):
+                futures = [
+                    (part, pool.submit(_write_partition_with_retry, driver, part, database))
+                    for part in partitions if part
+                ]
+                committed, error = [], None
+                for part, future in futures:
+                    try:
+                        part_written = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    committed.extend(part)
+                    chunk_written += part_written
+                    if part_written:
+                        bump_watermark(part_written, watermark_path)
+                if committed:
+                    session.execute_write(write_published, committed)
+                if error is not None:
+                    raise error
+                # Canonical nodes may sit in any partition, so link only once all are written
+                if duplicates:
+                    linked = session.execute_write(link_duplicates, duplicates)
+                    if linked:
+                        bump_watermark(linked, watermark_path)
+                    chunk_written += linked
+            incr("graph_rows", len(rows), result="loaded")
+            incr("graph_rows", chunk_written, result="written")
+            written += chunk_written
+            total += len(rows)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded {total} articles, {written} new or changed ({total / elapsed:.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    logger.info(
+        f"Finished loading {total} articles with {workers} workers in {elapsed:.2f}s ({rate:.0f} rows/sec), "
+        f"{written} new or changed, {total - written} unchanged"
+    )
+    return written
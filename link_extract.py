@@ -0,0 +1,145 @@
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+
+# Faster parsers are used when installed, in this order of preference
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.etree
+    from lxml.cssselect import CSSSelector
+    from lxml.etree import XPath
+except ImportError:
+    lxml = None
+
+# Default filters from the original depth-1 loop: pagination and downloads
+PAGINATION_PATTERN = r"(page=\d+|/page/\d+/?)"
+DOWNLOAD_PATTERN = r"\.(pdf|docx?|xlsx?|pptx?|zip|rar)(\?|$)"
+
+
+def _compile(patterns):
+    # All patterns folded into one regex, so each link costs a single search
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+# Per-source link filters, compiled once. `skip` patterns reject a link,
+# `allow` patterns (if any) must match, and `same_domain` drops off-site links.
+@dataclass
+class LinkRules:
+    skip: tuple = (PAGINATION_PATTERN, DOWNLOAD_PATTERN)
+    allow: tuple = ()
+    same_domain: bool = False
+    _skip_re: re.Pattern = field(init=False, repr=False, default=None)
+    _allow_re: re.Pattern = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        self._skip_re = _compile(self.skip)
+        self._allow_re = _compile(self.allow)
+
+    def accepts(self, url, base_host):
+        if self._skip_re is not None and self._skip_re.search(url):
+            return False
+        if self._allow_re is not None and not self._allow_re.search(url):
+            return False
+        if self.same_domain and urlsplit(url).netloc.lower() != base_host:
+            return False
+        return True
+
+
+DEFAULT_RULES = LinkRules()
+
+
+def available_backends():
+    backends = []
+    if HTMLParser is not None:
+        backends.append("selectolax")
+    if lxml is not None:
+        backends.append("lxml")
+    backends.append("bs4")
+    return backends
+
+
+def _hrefs_selectolax(html, selectors):
+    tree = HTMLParser(html)
+    for selector in selectors:
+        nodes = tree.css(selector)
+        yield [a.attributes.get("href") for node in nodes for a in node.css("a[href]")], bool(nodes)
+
+
+_css_cache = {}
+
+
+def _lxml_selector(selector):
+    # CSS -> XPath translation is the expensive part; do it once per selector
+    if selector not in _css_cache:
+        _css_cache[selector] = CSSSelector(selector)
+    return _css_cache[selector]
+
+
+def _hrefs_lxml(html, selectors):
+    # Plain etree parsing; lxml.html's element class lookup costs more than the parse
+    try:
+        doc = lxml.etree.HTML(html)
+    except ValueError:
+        # A str carrying an XML encoding declaration (common on XHTML pages);
+        # parse its UTF-8 bytes, overriding whatever encoding it declares
+        doc = lxml.etree.HTML(html.encode("utf-8"), parser=_UTF8_PARSER)
+    for selector in selectors:
+        if doc is None:
+            yield [], False
+            continue
+        nodes = _lxml_selector(selector)(doc)
+        hrefs = [href for node in nodes for href in _HREFS_XPATH(node)]
+        yield hrefs, bool(nodes)
+
+
+def _hrefs_bs4(html, selectors):
+    soup = BeautifulSoup(html, "html.parser")
+    for selector in selectors:
+        nodes = soup.select(selector)
+        yield [a.get("href") for node in nodes for a in node.select("a[href]")], bool(nodes)
+
+
+if lxml is not None:
+    _HREFS_XPATH = XPath(".//a/@href")
+    _UTF8_PARSER = lxml.etree.HTMLParser(encoding="utf-8")
+
+BACKENDS = {"selectolax": _hrefs_selectolax, "lxml": _hrefs_lxml, "bs4": _hrefs_bs4}
+
+
+# Article links under the CSS `selectors` of a listing page, resolved against
+# `base_url`, defragmented, filtered by `rules` and de-duplicated in page order.
+# Returns (links, found) where `found` tells whether any selector matched.
+def extract_links(html, base_url, selectors, rules=None, backend=None):
+    rules = rules or DEFAULT_RULES
+    backend = backend or available_backends()[0]
+    base_parts = urlsplit(base_url)
+    base_host = base_parts.netloc.lower()
+    origin = f"{base_parts.scheme}://{base_parts.netloc}"
+
+    links = {}
+    found = False
+    for hrefs, matched in BACKENDS[backend](html, selectors):
+        found = found or matched
+        for href in hrefs:
+            if not href or href.startswith('#') or href.startswith('javascript:'):
+                continue
+            if not href.startswith('http'):
+                # Root-relative paths are by far the most common; skip urljoin for them
+                if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+                    href = origin + href
+                else:
+                    href = urljoin(base_url, href)
+            if '#' in href:
+                href = urldefrag(href)[0]
+            if href not in links and rules.accepts(href, base_host):
+                links[href] = None
+    return list(links), found
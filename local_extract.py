@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date
+
+from blob_store import summarize
+from content_prune import HEADLINE_SEARCH_BLOCKS, find_headline, main_region, split_blocks
+
+# Product -> target pairs recognised without the LLM; also the list given to
+# the model in the crawl_rss instruction
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.json")
+
+# ArticleData fields filled in locally when they are found with confidence
+FIELDS = ("headline", "summary", "published_date", "product", "target")
+
+# Bumped when the rules below change, so cached extractions are redone
+RULES_VERSION = 2
+
+# Headlines outside this many words are more likely site titles or body text
+MIN_HEADLINE_WORDS = 3
+MAX_HEADLINE_WORDS = 40
+
+# The publication date only counts this many blocks around the headline
+DATE_BLOCKS_BEFORE = 2
+DATE_BLOCKS_AFTER = 3
+
+# The lede needs this many words to serve as the summary
+MIN_LEDE_WORDS = 15
+SUMMARY_CHARS = 300
+
+HEADING_PATTERN = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+LINK_PATTERN = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z\"“])")
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+DATE_PATTERNS = (
+    # 4 March 2025
+    (re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+{_MONTH},?\s+(\d{{4}})\b", re.IGNORECASE), ("d", "m", "y")),
+    # March 4, 2025
+    (re.compile(rf"\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.IGNORECASE), ("m", "d", "y")),
+    # 2025-03-04
+    (re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b"), ("y", "m", "d")),
+    # 03/04/2025 (US order, as on the sources crawled so far)
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), ("m", "d", "y")),
+)
+
+
+def parse_date(text, max_year=None):
+    # (matched text, datetime.date) for the first real calendar date in
+    # `text`, or None. Matches are checked with the calendar and a plausible
+    # year range, so "31 February" or "5 June 1066" are skipped.
+    max_year = max_year or date.today().year + 1
+    best = None
+    for pattern, order in DATE_PATTERNS:
+        for m in pattern.finditer(text):
+            if best is not None and m.start() >= best[0]:
+                break
+            parts = dict(zip(order, m.groups()))
+            month = parts["m"]
+            month = MONTHS[month[:3].lower()] if month[:3].isalpha() else int(month)
+            try:
+                value = date(int(parts["y"]), month, int(parts["d"]))
+            except ValueError:
+                continue
+            if 1990 <= value.year <= max_year:
+                best = (m.start(), m.group(0), value)
+                break
+    return best[1:] if best else None
+
+
+@dataclass
+class Match:
+    name: str
+    start: int
+    end: int
+
+
+# === Gazetteer ===
+# Known product names and their targets, matched in one pass over the text
+# with a multi-pattern trie (the goto automaton of Aho-Corasick). Names only
+# match as whole words, so the trie is walked from word starts only and needs
+# no failure links; matching is case-insensitive and leftmost-longest, so
+# "CG0070 + Keytruda" wins over "Keytruda". Loaded from gazetteer.json or
+# from the Product / Target nodes already in the graph.
+class Gazetteer:
+    def __init__(self, products):
+        self.products = {name: target or "" for name, target in products.items() if name}
+        self.version = hashlib.sha256(
+            json.dumps(self.products, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self._build()
+
+    @classmethod
+    def from_file(cls, path=GAZETTEER_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_graph(cls, driver, database="neo4j"):
+        records, _, _ = driver.execute_query(
+            "MATCH (p:Product) OPTIONAL MATCH (p)-[:FOR]->(t:Target) "
+            "RETURN p.name AS product, head(collect(t.name)) AS target",
+            database_=database,
+        )
+        return cls({r["product"]: r["target"] for r in records if r["product"]})
+
+    def _build(self):
+        # State 0 is the root; _names[state] is the name ending there, if any
+        self._goto = [{}]
+        self._names = [None]
+        for name in self.products:
+            state = 0
+            for ch in name.lower():
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._names.append(None)
+                state = nxt
+            self._names[state] = name
+        # Word starts that can begin a name (first two characters); everything
+        # else is skipped by the regex engine
+        prefixes = sorted({re.escape(name.lower()[:2]) for name in self.products})
+        self._starts = re.compile(rf"(?<!\w)(?:{'|'.join(prefixes)})") if prefixes else None
+
+    def find(self, text):
+        # Non-overlapping whole-word matches in `text`, in order
+        if self._starts is None:
+            return []
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Case folding changed the length; positions must stay in step
+            lowered = "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+        goto, names = self._goto, self._names
+        matches, end = [], 0
+        for start in self._starts.finditer(lowered, 0):
+            i = start.start()
+            if i < end:
+                continue
+            state, longest = 0, None
+            for j in range(i, len(lowered)):
+                state = goto[state].get(lowered[j])
+                if state is None:
+                    break
+                if names[state] is not None and _whole_word(text, i, j + 1):
+                    longest = Match(names[state], i, j + 1)
+            if longest is not None:
+                matches.append(longest)
+                end = longest.end
+        return matches
+
+    def keywords(self):
+        # Product and target names, for content_prune.prune to keep in the
+        # text sent to the model
+        return tuple(dict.fromkeys([*self.products, *filter(None, self.products.values())]))
+
+    def describe(self):
+        # Product list in the form used by the extraction instruction
+        return ",\n".join(f"'{name}': '{target}'" for name, target in self.products.items())
+
+
+def _whole_word(text, start, end):
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not ((text[start].isalnum() and before.isalnum()) or (text[end - 1].isalnum() and after.isalnum()))
+
+
+@dataclass
+class LocalFields:
+    fields: dict = field(default_factory=dict)
+    missing: list = field(default_factory=list)
+
+
+def _plain(line):
+    return " ".join(LINK_PATTERN.sub(r"\1", line).split())
+
+
+def article_headline(blocks):
+    # (block index, text) of the heading just above the main article text
+    # (content_prune.main_region), or (None, "") when the page has no such
+    # heading; a site title elsewhere on the page does not count
+    span = main_region(blocks)
+    if span is None:
+        return None, ""
+    start, end = span
+    i = find_headline(blocks, start)
+    if i is None or not start - HEADLINE_SEARCH_BLOCKS < i <= end:
+        return None, ""
+    m = HEADING_PATTERN.match(blocks[i].text)
+    return i, _plain(m.group(2)) if m else ""
+
+
+def find_lede(blocks, start):
+    # First article paragraph after the headline, if long enough to summarise
+    for block in blocks[start:]:
+        if block.content:
+            text = _plain(block.text)
+            return text if len(text.split()) >= MIN_LEDE_WORDS else ""
+    return ""
+
+
+def choose_product(gazetteer, headline, lede):
+    # The one product named in the headline, else the one named in the lede.
+    # Mentions further down the page, or several products in the same place,
+    # are left to the model.
+    for text in (headline, lede):
+        named = {m.name for m in gazetteer.find(text)}
+        if len(named) == 1:
+            return named.pop()
+        if named:
+            return None
+    return None
+
+
+# Fields found in page markdown without the LLM. `missing` lists the fields
+# that still need the model. Nothing is taken unless the page has a headline
+# over its article text; the date must sit next to that headline and the
+# product must be named in it or in the lede. With `exhaustive`, the
+# gazetteer is the complete list of products to extract (as in crawl_rss), so
+# a page without a match has no product; otherwise a page without a confident
+# match leaves product and target to the model.
+def extract_local(markdown, gazetteer, exhaustive=False):
+    result = LocalFields()
+    blocks = split_blocks([markdown])
+
+    index, headline = article_headline(blocks)
+    if index is not None:
+        if MIN_HEADLINE_WORDS <= len(headline.split()) <= MAX_HEADLINE_WORDS:
+            result.fields["headline"] = headline
+
+        near = blocks[max(index - DATE_BLOCKS_BEFORE, 0):index + 1 + DATE_BLOCKS_AFTER]
+        found = parse_date("\n".join(b.text for b in near))
+        if found is not None:
+            result.fields["published_date"] = found[0]
+
+        lede = find_lede(blocks, index + 1)
+        if lede:
+            result.fields["summary"] = summarize(" ".join(SENTENCE_END.split(lede)[:2]), SUMMARY_CHARS)
+
+        product = choose_product(gazetteer, headline, lede)
+        if product is not None:
+            result.fields["product"] = product
+            result.fields["target"] = gazetteer.products.get(product, "")
+        elif exhaustive and not gazetteer.find(markdown):
+            result.fields["product"] = result.fields["target"] = ""
+
+    result.missing = [f for f in FIELDS if f not in result.fields]
+    return result
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+PREFIX = "pipeline"
+
+_NULL_SPAN = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+# === Run Metrics ===
+# Per-stage spans (latency histograms), counters and histograms for one
+# pipeline run, exported as a JSON run report and a Prometheus textfile.
+# Disabled unless PIPELINE_METRICS is set or enable() is called; while
+# disabled every call returns immediately.
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        # Drops everything recorded so far and restarts the run clock
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = datetime.now(timezone.utc)
+            self._start = time.perf_counter()
+
+    def incr(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0, "max": 0.0}
+            index = bisect_left(BUCKETS, value)
+            if index < len(BUCKETS):
+                hist["buckets"][index] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+            hist["max"] = max(hist["max"], value)
+
+    def span(self, stage, **labels):
+        # Times a block into the stage_seconds histogram
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(stage, labels)
+
+    @contextmanager
+    def _span(self, stage, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def report(self):
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(labels), "count": h["count"],
+                 "sum": round(h["sum"], 6), "max": round(h["max"], 6),
+                 "mean": round(h["sum"] / h["count"], 6) if h["count"] else 0.0}
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(time.perf_counter() - self._start, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{PREFIX}_{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_label_text(labels)} {value}")
+
+            for (name, labels), h in sorted(self.histograms.items()):
+                metric = f"{PREFIX}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h["buckets"]):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_bucket{_label_text(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {h['sum']}")
+                lines.append(f"{metric}_count{_label_text(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path="run_report.json"):
+        _write_atomic(path, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, path="pipeline.prom"):
+        # Written via rename so node_exporter's textfile collector never reads a partial file
+        _write_atomic(path, self.prometheus_text())
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# Process-wide instance used by every module
+metrics = Metrics(enabled=bool(os.getenv("PIPELINE_METRICS")))
+span = metrics.span
+incr = metrics.incr
+observe = metrics.observe
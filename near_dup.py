@@ -0,0 +1,244 @@
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+
+from json_to_graph import normalize_link
+
+try:
+    import numpy
+except ImportError:  # pure-Python signatures are slower but identical
+    numpy = None
+
+# Estimated Jaccard similarity of word shingles above which two articles are
+# near-duplicates (same press release with a different header / footer)
+THRESHOLD = 0.8
+
+# Texts shorter than this carry too little signal to compare
+MIN_WORDS = 50
+
+SHINGLE_SIZE = 3
+
+# MinHash signature length, and its split into LSH bands of BAND_ROWS values.
+# 25 bands x 5 rows surface pairs at 0.8 similarity >99.99% of the time and
+# pairs at 0.3 ~6% of the time; candidates are then checked on the full signature.
+NUM_PERM = 128
+BAND_ROWS = 5
+BANDS = NUM_PERM // BAND_ROWS
+
+_MASK64 = (1 << 64) - 1
+_MASK32 = (1 << 32) - 1
+
+# Fixed hash functions so signatures stay comparable across runs. Each
+# permutation is a multiply-shift hash: ((a * x + b) mod 2**64) >> 32.
+_rng = random.Random(0x5EED)
+PERM_A = [_rng.randrange(1, 1 << 64) | 1 for _ in range(NUM_PERM)]
+PERM_B = [_rng.randrange(0, 1 << 64) for _ in range(NUM_PERM)]
+# Word-position multipliers combining word hashes into a shingle hash
+SHINGLE_MULTIPLIERS = [_rng.randrange(1, 1 << 32) | 1 for _ in range(SHINGLE_SIZE)]
+del _rng
+
+if numpy is not None:
+    _PERM_A = numpy.array(PERM_A, dtype=numpy.uint64)
+    _PERM_B = numpy.array(PERM_B, dtype=numpy.uint64)
+
+WORD_PATTERN = re.compile(r"\w+")
+# Markdown link / image targets differ per syndication site and are dropped
+LINK_TARGET_PATTERN = re.compile(r"\]\([^)]*\)|https?://\S+")
+
+
+def shingle_hashes(text):
+    # (word count, 32-bit hashes of the word shingles). Words are hashed once
+    # and combined per position, so no shingle string is built.
+    words = WORD_PATTERN.findall(LINK_TARGET_PATTERN.sub("]", str(text or "")).lower())
+    word_hash = {}
+    for w in words:
+        if w not in word_hash:
+            word_hash[w] = zlib.crc32(w.encode("utf-8"))
+    hashed = [word_hash[w] for w in words]
+    count = len(hashed) - SHINGLE_SIZE + 1
+    if count <= 0:
+        return len(words), []
+    if numpy is not None:
+        # uint64 arithmetic wraps around, which leaves the low 32 bits exact
+        hashed = numpy.array(hashed, dtype=numpy.uint64)
+        combined = numpy.zeros(count, dtype=numpy.uint64)
+        for i, m in enumerate(SHINGLE_MULTIPLIERS):
+            combined += hashed[i:i + count] * numpy.uint64(m)
+        return len(words), numpy.unique(combined & numpy.uint64(_MASK32))
+    columns = [hashed[i:i + count] for i in range(SHINGLE_SIZE)]
+    shingles = {sum(m * h for m, h in zip(SHINGLE_MULTIPLIERS, parts)) & _MASK32 for parts in zip(*columns)}
+    return len(words), list(shingles)
+
+
+def minhash(text, min_words=MIN_WORDS):
+    # MinHash signature (NUM_PERM 32-bit values), or None when the text is too short
+    words, hashes = shingle_hashes(text)
+    if words < max(min_words, SHINGLE_SIZE) or not len(hashes):
+        return None
+    if numpy is not None:
+        values = (hashes[:, None] * _PERM_A + _PERM_B) >> numpy.uint64(32)
+        return array("I", values.min(axis=0).astype(numpy.uint32).tobytes())
+    return array("I", (min(((a * x + b) & _MASK64) >> 32 for x in hashes) for a, b in zip(PERM_A, PERM_B)))
+
+
+def similarity(a, b):
+    # Estimated Jaccard similarity of two signatures
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def band_keys(signature):
+    # One lookup key per band; the band number is part of the key
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]
+        digest = hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+# === Near-Duplicate Index ===
+# MinHash signatures of canonical article bodies, persisted in SQLite with an
+# LSH band table, so syndicated copies of a press release (company site,
+# Newsfile, GlobeNewswire, ...) are recognised before extraction and before
+# insert. The first article registered is canonical; later near-copies point
+# at it. `key` optionally stores the canonical's extraction cache key; the
+# extraction strategy registers an article only once it has been extracted.
+# Both stages sign the whole page markdown (the record's description), so
+# signatures from the crawl and from the graph load are comparable.
+class NearDuplicateIndex:
+    def __init__(self, path="near_duplicates.db", threshold=THRESHOLD, min_words=MIN_WORDS):
+        self.path = path
+        self.threshold = threshold
+        self.min_words = min_words
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE,
+                key TEXT,
+                signature BLOB
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                bucket INTEGER,
+                article_id INTEGER
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands(bucket)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bands_article ON bands(article_id)")
+        self.conn.commit()
+
+    def _find(self, url, signature, keys):
+        own = self.conn.execute("SELECT id FROM articles WHERE url = ?", (url,)).fetchone()
+        rows = self.conn.execute(f"""
+            SELECT DISTINCT a.id, a.url, a.key, a.signature FROM bands b
+            JOIN articles a ON a.id = b.article_id
+            WHERE b.bucket IN ({",".join("?" * len(keys))})
+        """, keys)
+        best = None
+        for row_id, other, key, blob in rows:
+            # Only articles registered earlier can be canonical for this one
+            if other == url or (own is not None and row_id > own[0]):
+                continue
+            score = similarity(signature, array("I", blob))
+            if score >= self.threshold and (best is None or (-score, row_id) < best[:2]):
+                best = (-score, row_id, other, key)
+        return (best[2], best[3]) if best else None
+
+    def _registered(self, url):
+        # (id, key, signature bytes) of `url` when it is registered
+        return self.conn.execute("SELECT id, key, signature FROM articles WHERE url = ?", (url,)).fetchone()
+
+    def _register(self, url, signature, keys, key):
+        # Returns False when nothing had to be written
+        row = self._registered(url)
+        if row is None:
+            row_id = self.conn.execute(
+                "INSERT INTO articles (url, key, signature) VALUES (?, ?, ?)",
+                (url, key, signature.tobytes()),
+            ).lastrowid
+        elif row[2] == signature.tobytes():
+            # Unchanged article: at most a new extraction cache key
+            if not key or key == row[1]:
+                return False
+            self.conn.execute("UPDATE articles SET key = ? WHERE id = ?", (key, row[0]))
+            return True
+        else:
+            # Re-crawled article: keep its position, refresh its content
+            row_id = row[0]
+            self.conn.execute(
+                "UPDATE articles SET key = COALESCE(NULLIF(?, ''), key), signature = ? WHERE id = ?",
+                (key, signature.tobytes(), row_id),
+            )
+            self.conn.execute("DELETE FROM bands WHERE article_id = ?", (row_id,))
+        self.conn.executemany("INSERT INTO bands VALUES (?, ?)", [(k, row_id) for k in keys])
+        return True
+
+    def _prepare(self, url, text):
+        url = normalize_link(url)
+        signature = minhash(text, self.min_words)
+        if signature is None or not url:
+            return None
+        return url, signature, band_keys(signature)
+
+    def find(self, url, text):
+        # (canonical_url, canonical_key) when `text` near-duplicates an article
+        # registered earlier, else None. Registers nothing; see register.
+        prepared = self._prepare(url, text)
+        if prepared is None:
+            return None
+        with self._lock:
+            match = self._find(*prepared)
+            if match is not None:
+                self.duplicates += 1
+            return match
+
+    def register(self, url, text, key=""):
+        # Registers `url` as a canonical article, e.g. once its extraction
+        # succeeded and is cached under `key`
+        prepared = self._prepare(url, text)
+        if prepared is None:
+            return
+        with self._lock:
+            if self._register(*prepared, key):
+                self.conn.commit()
+
+    def check(self, url, text, key=""):
+        # find, registering `url` as canonical when it is not a near-duplicate.
+        # Articles already registered are canonical and return straight away
+        # without touching their signature (only register refreshes it), so
+        # reloading old files writes nothing and computes no signature.
+        with self._lock:
+            if self._registered(normalize_link(url)) is not None:
+                return None
+        prepared = self._prepare(url, text)
+        if prepared is None:
+            return None
+        url, signature, keys = prepared
+        with self._lock:
+            if self._registered(url) is not None:
+                return None
+            match = self._find(url, signature, keys)
+            if match is not None:
+                self.duplicates += 1
+                return match
+            self._register(url, signature, keys, key)
+            self.conn.commit()
+        return None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,12 +1,37 @@
 
 import snowflake.connector
 import asyncio
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+from crawl4ai import AsyncWebCrawler, BrowserConfig
 from crawl4rss import crawl_rss
 from crawl4 import crawl_html
-import json
-from neo_json import build_graph
+from neo_json import WRITE_WORKERS, backfill_bodies, ensure_schema, iter_articles, load_articles_parallel
 from neo4j import GraphDatabase
 from rag import rag
+from seen_store import SeenStore
+from extraction_cache import ExtractionCache
+from feed_fetcher import FeedState
+from adaptive_wait import SettleStats
+from blob_store import BlobStore
+from article_sink import ArticleSink, article_files, read_loaded_segment, save_loaded_segment
+from itertools import chain
+from near_dup import NearDuplicateIndex
+from local_extract import Gazetteer
+from metrics import incr, metrics, observe, span
+
+
+# Stage timings and counters are collected when PIPELINE_METRICS is set, and
+# written as a JSON run report plus a Prometheus textfile (for node_exporter)
+RUN_REPORT_PATH = "run_report.json"
+PROMETHEUS_PATH = "pipeline.prom"
+
+
+def export_metrics():
+    if metrics.enabled:
+        metrics.write_json(RUN_REPORT_PATH)
+        metrics.write_prometheus(PROMETHEUS_PATH)
 
 
 # === Snowflake Connection Setup ===
@@ -46,44 +71,162 @@ WHERE s.web_src_id IN (54, 53)
 """
 
 
-cur.execute(query)
-rows = cur.fetchall()
+with span("source_query"):
+    cur.execute(query)
+    rows = cur.fetchall()
 
 # === Web Crawling ===
-# Loop through each source and run appropriate crawling method
-for r in rows:
-    if r[2] == "RSS":
-        
-        asyncio.run(crawl_rss([r[1]]))
-    elif r[2] == "HTML":
-
-        print(r[1])  
-        asyncio.run(crawl_html(
-            [r[1]],
-            r[3],  # selector
-            r[4],  # web source name
-            r[5],  # web source description
-            max_concurrent=2,
-        ))
-
-
-# Read crawled articles from local JSON file
-with open("extracted_articles.json", "r", encoding="utf-8") as f:
-    articles = json.load(f)
+# Articles already ingested by earlier runs are skipped via the seen-URL store
+seen_store = SeenStore("seen_urls.db")
+# LLM extraction results are reused for pages whose content has not changed
+extraction_cache = ExtractionCache("extraction_cache.db", max_entries=50000)
+# ETag / Last-Modified and newest-entry watermarks for RSS feeds
+feed_state = FeedState("feed_state.json")
+# Per-domain page settle times, used to size the browser wait for article pages
+settle_stats = SettleStats("settle_times.json")
+# Syndicated copies of a press release are linked to the first copy seen,
+# both before LLM extraction and before graph insert
+near_duplicates = NearDuplicateIndex("near_duplicates.db")
+# Known products and targets: the RSS prompt's product list and the paragraphs
+# kept when pages are pruned; pass local_extraction=True to the crawlers to
+# also find fields in the page without the LLM
+# (Gazetteer.from_graph(driver) reads them from the Product / Target nodes instead)
+gazetteer = Gazetteer.from_file("gazetteer.json")
+# One buffered writer for all crawlers; rotated daily and at 512 MB
+article_sink = ArticleSink("extracted_articles.json", max_bytes=512 * 1024 * 1024, rotate_daily=True)
+
+# Sources crawled at the same time, overall and per domain
+MAX_CONCURRENT_SOURCES = 4
+MAX_SOURCES_PER_DOMAIN = 1
+
+# Per-source static HTML checks (keyword arguments for http_fetch.looks_complete),
+# keyed on web source name. Sources without an entry use the default check.
+# e.g. {"THERALASE PRESS RELEASE": {"content_selector": "article", "min_text_chars": 800}}
+STATIC_CHECKS = {}
+
+# Per-source depth-1 link filters (link_extract.LinkRules), keyed on web
+# source name. Sources without an entry skip pagination and download links only.
+# e.g. {"THERALASE PRESS RELEASE": LinkRules(same_domain=True)}
+LINK_RULES = {}
+
+
+# === Crawl Scheduler ===
+# Runs all RSS and HTML sources concurrently on one shared browser, bounded by a
+# global cap and a per-domain politeness limit, and reports time per source.
+async def crawl_sources(rows, max_sources=MAX_CONCURRENT_SOURCES, per_domain=MAX_SOURCES_PER_DOMAIN):
+    global_limit = asyncio.Semaphore(max_sources)
+    domain_limits = defaultdict(lambda: asyncio.Semaphore(per_domain))
+    timings = []
+
+    async with AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False)) as crawler:
+
+        async def run_source(r):
+            domain = urlsplit(r[1]).netloc.lower()
+            # Domain permit first, so sources waiting on a busy domain do
+            # not sit on global slots other domains could use
+            async with domain_limits[domain], global_limit:
+                start = time.perf_counter()
+                status = "ok"
+                try:
+                    if r[2] == "RSS":
+                        await crawl_rss(
+                            [r[1]],
+                            seen_store=seen_store,
+                            extraction_cache=extraction_cache,
+                            crawler=crawler,
+                            feed_state=feed_state,
+                            sink=article_sink,
+                            nm=r[4],
+                            desc=r[5],
+                            dedup=near_duplicates,
+                            gazetteer=gazetteer,
+                        )
+                    elif r[2] == "HTML":
+                        print(r[1])
+                        await crawl_html(
+                            [r[1]],
+                            r[3],  # selector
+                            r[4],  # web source name
+                            r[5],  # web source description
+                            max_concurrent=2,
+                            seen_store=seen_store,
+                            extraction_cache=extraction_cache,
+                            crawler=crawler,
+                            http_first=True,
+                            static_check=STATIC_CHECKS.get(r[4]),
+                            settle_stats=settle_stats,
+                            sink=article_sink,
+                            link_rules=LINK_RULES.get(r[4]),
+                            dedup=near_duplicates,
+                            gazetteer=gazetteer,
+                        )
+                    else:
+                        status = f"skipped ({r[2]})"
+                except Exception as e:
+                    # One failing source must not cancel the others
+                    status = f"failed: {e}"
+                    incr("source_failures", src_type=r[2])
+                elapsed = time.perf_counter() - start
+                observe("stage_seconds", elapsed, stage="source", src_type=r[2])
+                timings.append((r[4] or r[1], r[2], elapsed, status))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_source(r) for r in rows))
+        await article_sink.close()
+        total = time.perf_counter() - start
+
+    print(f"\n=== Crawl Timing ===")
+    for name, src_type, elapsed, status in sorted(timings, key=lambda t: -t[2]):
+        print(f"{elapsed:8.1f}s  {src_type:<5} {name}  [{status}]")
+    print(f"Total wall-clock: {total:.1f}s (sum of sources: {sum(t[2] for t in timings):.1f}s)")
+    return timings
+
+
+with span("crawl"):
+    asyncio.run(crawl_sources(rows))
+
+seen_store.close()
+extraction_cache.close()
+
+
+# Stream crawled articles from the local JSONL file and the rotated segments
+# not loaded by an earlier run (read lazily, batch by batch)
+article_paths = article_files("extracted_articles.json", after=read_loaded_segment())
+articles = chain.from_iterable(iter_articles(path) for path in article_paths)
 
 
 # Connect to Neo4j database (update auth info as needed)
 driver = GraphDatabase.driver("bolt://localhost:7687", auth=("yourusername", "yourpassword"))
 
-# Load crawled data into the graph using the `build_graph` function
-with driver.session(database="neo4j") as session:
-    session.execute_write(build_graph, articles)
+# Make sure the unique keys used by the loader's MERGEs exist
+ensure_schema(driver)
+
+# Full article bodies go to a compressed local blob store; Content nodes keep
+# a summary and the body hash (see blob_store.load_body)
+blob_store = BlobStore("bodies")
+# Bodies loaded before the store was enabled are moved out once
+backfill_bodies(driver, blob_store)
+
+# Load crawled data into the graph in batches, written by parallel workers
+# (set GRAPH_WRITE_WORKERS to change the worker count)
+with span("graph_load"):
+    load_articles_parallel(driver, articles, workers=WRITE_WORKERS, batch_size=1000, blob_store=blob_store,
+                           dedup=near_duplicates)
+save_loaded_segment(article_paths, "extracted_articles.json")
+blob_store.close()
+near_duplicates.close()
+export_metrics()
 
 
-# Accept natural language question input from user
-q = input("Ask question: ")
+# Accept natural language questions until an empty line; the QA service
+# behind `rag` is built once and reused across questions
+while True:
+    q = input("Ask question: ").strip()
+    if not q:
+        break
 
-# Run retrieval-augmented generation to get the answer from the graph
-rag(q)
+    # Run retrieval-augmented generation to get the answer from the graph
+    rag(q)
 
 driver.close()
+export_metrics()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Minimum cosine similarity for a semantic (embedding) cache hit
+SIMILARITY_THRESHOLD = 0.97
+
+QUOTED_RE = re.compile(r"""["'‘’“”]([^"'‘’“”]+)["'‘’“”]""")
+# Tokens that look like entity names: contain a digit or an upper-case letter
+# after the first character (TLD-1433, Keytruda, BCG, ...)
+LITERAL_RE = re.compile(r"\b(?=\w*[\dA-Z])[\w\-®+]+")
+
+
+def normalize_question(question):
+    # Case, whitespace, quote style and trailing punctuation do not change the query
+    q = question.strip().lower()
+    q = re.sub(r"[‘’“”]", '"', q).replace("'", '"')
+    q = re.sub(r"\s+", " ", q)
+    return q.rstrip("?.! ")
+
+
+def question_literals(question):
+    # Entity-like values in a question; two questions may only share a cached
+    # query when these agree, whatever their embedding similarity
+    literals = {m.strip().lower() for m in QUOTED_RE.findall(question)}
+    words = question.strip().split(" ", 1)
+    rest = words[1] if len(words) > 1 else ""
+    literals.update(m.lower() for m in LITERAL_RE.findall(rest))
+    return sorted(literals)
+
+
+def schema_fingerprint(schema):
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+# === Cypher Cache ===
+# Validated question -> Cypher pairs, keyed on the normalized question and the
+# schema fingerprint so a schema change never serves a stale query. With an
+# `embeddings` model (LangChain Embeddings), paraphrases of an answered
+# question are matched by nearest neighbour as well.
+class CypherCache:
+    def __init__(self, path="cypher_cache.db", embeddings=None,
+                 similarity_threshold=SIMILARITY_THRESHOLD, max_entries=5000):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cypher (
+                schema_fp TEXT,
+                question TEXT,
+                literals TEXT,
+                cypher TEXT,
+                embedding TEXT,
+                last_used REAL,
+                PRIMARY KEY (schema_fp, question)
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, question, schema_fp):
+        normalized = normalize_question(question)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT cypher FROM cypher WHERE schema_fp = ? AND question = ?",
+                (schema_fp, normalized),
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                self._touch(schema_fp, normalized)
+                return row[0]
+
+        if self.embeddings is not None:
+            cypher = self._nearest(question, schema_fp)
+            if cypher is not None:
+                self.semantic_hits += 1
+                return cypher
+
+        self.misses += 1
+        return None
+
+    def _nearest(self, question, schema_fp):
+        literals = json.dumps(question_literals(question))
+        with self._lock:
+            candidates = self.conn.execute(
+                "SELECT question, cypher, embedding FROM cypher "
+                "WHERE schema_fp = ? AND literals = ? AND embedding IS NOT NULL",
+                (schema_fp, literals),
+            ).fetchall()
+        if not candidates:
+            return None
+
+        vector = self.embeddings.embed_query(normalize_question(question))
+        best_score, best = 0.0, None
+        for cached_question, cypher, embedding in candidates:
+            score = _cosine(vector, json.loads(embedding))
+            if score > best_score:
+                best_score, best = score, (cached_question, cypher)
+        if best is None or best_score < self.similarity_threshold:
+            return None
+        with self._lock:
+            self._touch(schema_fp, best[0])
+        return best[1]
+
+    def _touch(self, schema_fp, normalized):
+        self.conn.execute(
+            "UPDATE cypher SET last_used = ? WHERE schema_fp = ? AND question = ?",
+            (time.time(), schema_fp, normalized),
+        )
+        self.conn.commit()
+
+    def put(self, question, schema_fp, cypher):
+        normalized = normalize_question(question)
+        embedding = None
+        if self.embeddings is not None:
+            embedding = json.dumps(self.embeddings.embed_query(normalized))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cypher VALUES (?, ?, ?, ?, ?, ?)",
+                (schema_fp, normalized, json.dumps(question_literals(question)),
+                 cypher, embedding, time.time()),
+            )
+            self.conn.execute("""
+                DELETE FROM cypher WHERE rowid IN (
+                    SELECT rowid FROM cypher ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self.conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "semantic_hits": self.semantic_hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def _digest(value):
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+# === Result Cache ===
+# In-memory (Cypher, params) -> rows and (question, rows) -> answer caches for
+# the current graph contents. Both are dropped as soon as the ingestion
+# watermark moves, i.e. when the loader has committed new Content.
+class ResultCache:
+    def __init__(self, max_entries=1000, watermark=0):
+        self.max_entries = max_entries
+        self.watermark = watermark
+        self.rows = OrderedDict()
+        self.answers = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, watermark):
+        with self._lock:
+            if watermark == self.watermark:
+                return False
+            self.watermark = watermark
+            self.rows.clear()
+            self.answers.clear()
+            return True
+
+    def _get(self, store, key):
+        with self._lock:
+            if key not in store:
+                self.misses += 1
+                return None
+            self.hits += 1
+            store.move_to_end(key)
+            return store[key]
+
+    def _put(self, store, key, value):
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > self.max_entries:
+                store.popitem(last=False)
+
+    def get_rows(self, cypher, params=None):
+        return self._get(self.rows, _digest([cypher, params or {}]))
+
+    def put_rows(self, cypher, params, rows):
+        self._put(self.rows, _digest([cypher, params or {}]), rows)
+
+    def get_answer(self, question, rows):
+        return self._get(self.answers, _digest([normalize_question(question), rows]))
+
+    def put_answer(self, question, rows, answer):
+        self._put(self.answers, _digest([normalize_question(question), rows]), answer)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "watermark": self.watermark}
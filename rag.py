@@ -1,15 +1,30 @@
 
 from langchain_community.graphs import Neo4jGraph
-from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain
+from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain, extract_cypher
+from langchain_community.chains.graph_qa.cypher_utils import CypherQueryCorrector, Schema
 from langchain_google_vertexai import ChatVertexAI
 from langchain.prompts import PromptTemplate
 import os
 import logging
+import time
+import argparse
+import asyncio
+import json
+from json_to_graph import WATERMARK_PATH, read_watermark
+from qa_cache import CypherCache, ResultCache, schema_fingerprint
+from intent_matcher import IntentMatcher
+from metrics import incr, span
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Schema is re-read at least this often even without a loader signal
+SCHEMA_TTL_SECONDS = 3600
+
+# Questions answered concurrently by answer_batch
+BATCH_WORKERS = 8
+
 # === Neo4j Connection Setup ===
 # Establishes connection to the local Neo4j instance using credentials from environment variables
 
@@ -164,27 +179,218 @@ def ask_question(cypher_chain, question):
         logger.error(f"Error processing question '{question}': {e}")
         return f"Sorry, I encountered an error while processing your question: {e}"
 
+def _text(output):
+    # LLMChain returns {"text": ...}; runnable chains return the string itself
+    return output["text"] if isinstance(output, dict) else output
+
+
+# === QA Service ===
+# Long-lived question answering: the Neo4j handle and the Cypher QA chain are
+# built once and reused. The schema is only re-read when the graph loader bumps
+# the ingestion watermark or the TTL expires. Generated Cypher is cached per
+# question and schema, so repeat questions skip the Cypher LLM; query rows and
+# answers are cached until the next ingestion. With `fast_path`, questions that
+# match a canonical template are answered without any LLM call.
+class GraphQAService:
+    def __init__(self, schema_ttl=SCHEMA_TTL_SECONDS, watermark_path=WATERMARK_PATH, cypher_cache=None,
+                 result_cache=None, fast_path=True):
+        self.schema_ttl = schema_ttl
+        self.watermark_path = watermark_path
+        self.cypher_cache = cypher_cache if cypher_cache is not None else CypherCache()
+        self.graph = setup_neo4j_connection()
+        logger.debug(f"Neo4j Schema:\n{self.graph.schema}")
+        self.chain = create_cypher_chain(self.graph)
+        self.schema_fp = schema_fingerprint(self.chain.graph_schema)
+        self.watermark = read_watermark(watermark_path)
+        self.schema_loaded_at = time.monotonic()
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.result_cache.invalidate(self.watermark)
+        self.fast_path = fast_path
+        self.intents = IntentMatcher.from_graph(self.graph) if fast_path else None
+
+    def refresh_if_stale(self):
+        # Returns True when the schema was refreshed
+        watermark = read_watermark(self.watermark_path)
+        if self.result_cache.invalidate(watermark):
+            logger.info(f"Graph changed (watermark {watermark}), cleared cached results")
+        expired = time.monotonic() - self.schema_loaded_at > self.schema_ttl
+        if watermark == self.watermark and not expired:
+            return False
+
+        self.graph.refresh_schema()
+        # Keep the chain's copies of the schema in step with the graph
+        self.chain.graph_schema = self.graph.get_schema
+        if self.chain.cypher_query_corrector is not None:
+            self.chain.cypher_query_corrector = CypherQueryCorrector([
+                Schema(el["start"], el["type"], el["end"])
+                for el in self.graph.get_structured_schema.get("relationships", [])
+            ])
+        self.schema_fp = schema_fingerprint(self.chain.graph_schema)
+        # New articles can bring new Product / Target / WebSource names
+        if self.fast_path:
+            self.intents = IntentMatcher.from_graph(self.graph)
+        self.watermark = watermark
+        self.schema_loaded_at = time.monotonic()
+        logger.info(f"Refreshed Neo4j schema (watermark {watermark})")
+        return True
+
+    # The three stages GraphCypherQAChain runs, split so each can be cached
+    def _clean_cypher(self, generated):
+        cypher = extract_cypher(_text(generated))
+        if self.chain.cypher_query_corrector is not None:
+            cypher = self.chain.cypher_query_corrector(cypher)
+        return cypher
+
+    def generate_cypher(self, question):
+        with span("qa_cypher_generation"):
+            return self._clean_cypher(self.chain.cypher_generation_chain.invoke(
+                {"question": question, "schema": self.chain.graph_schema}
+            ))
+
+    async def agenerate_cypher(self, question):
+        with span("qa_cypher_generation"):
+            return self._clean_cypher(await self.chain.cypher_generation_chain.ainvoke(
+                {"question": question, "schema": self.chain.graph_schema}
+            ))
+
+    def run_cypher(self, cypher, params=None):
+        with span("qa_query"):
+            return self.graph.query(cypher, params or {})[: self.chain.top_k]
+
+    def generate_answer(self, question, context):
+        with span("qa_answer_generation"):
+            return _text(self.chain.qa_chain.invoke({"question": question, "context": context}))
+
+    async def agenerate_answer(self, question, context):
+        with span("qa_answer_generation"):
+            return _text(await self.chain.qa_chain.ainvoke({"question": question, "context": context}))
+
+    def match_intent(self, question):
+        return self.intents.match(question) if self.intents is not None else None
+
+    def answer_intent(self, intent):
+        # Template fast path: parameterized Cypher and a deterministic answer
+        rows = self.result_cache.get_rows(intent.cypher, intent.params)
+        if rows is None:
+            rows = self.run_cypher(intent.cypher, intent.params)
+            self.result_cache.put_rows(intent.cypher, intent.params, rows)
+        return intent.render(rows)
+
+    def ask(self, question):
+        self.refresh_if_stale()
+        try:
+            logger.info(f"Processing question: {question}")
+            intent = self.match_intent(question)
+            if intent is not None:
+                logger.info(f"Matched template '{intent.name}' {intent.params}")
+                incr("qa_questions", path="intent")
+                return self.answer_intent(intent)
+
+            cypher = self.cypher_cache.get(question, self.schema_fp)
+            cached = cypher is not None
+            incr("qa_questions", path="cached_cypher" if cached else "llm")
+            if not cached:
+                cypher = self.generate_cypher(question)
+            if not cypher:
+                return "Sorry, I could not build a query for that question."
+            logger.info(f"Generated Cypher{' (cached)' if cached else ''}: {cypher}")
+
+            context = self.result_cache.get_rows(cypher)
+            if context is None:
+                context = self.run_cypher(cypher)
+                self.result_cache.put_rows(cypher, None, context)
+            # Only queries that executed cleanly are remembered
+            if not cached:
+                self.cypher_cache.put(question, self.schema_fp, cypher)
+
+            answer = self.result_cache.get_answer(question, context)
+            if answer is None:
+                answer = self.generate_answer(question, context)
+                self.result_cache.put_answer(question, context, answer)
+            return answer
+
+        except Exception as e:
+            logger.error(f"Error processing question '{question}': {e}")
+            return f"Sorry, I encountered an error while processing your question: {e}"
+
+    # Async variant of ask() for batch runs. Returns a result record with the
+    # Cypher used and per-stage latency in milliseconds.
+    async def aask(self, question):
+        record = {"question": question, "cypher": None, "answer": None, "error": None,
+                  "cypher_cached": False, "intent": None, "latency_ms": {}}
+        latency = record["latency_ms"]
+        try:
+            start = time.perf_counter()
+            intent = self.match_intent(question)
+            if intent is not None:
+                record["intent"] = intent.name
+                incr("qa_questions", path="intent")
+                record["cypher"] = intent.cypher.strip()
+                record["answer"] = await asyncio.to_thread(self.answer_intent, intent)
+                latency["intent"] = round((time.perf_counter() - start) * 1000, 1)
+                return record
+
+            cypher = await asyncio.to_thread(self.cypher_cache.get, question, self.schema_fp)
+            cached = record["cypher_cached"] = cypher is not None
+            incr("qa_questions", path="cached_cypher" if cached else "llm")
+            if not cached:
+                cypher = await self.agenerate_cypher(question)
+            latency["cypher"] = round((time.perf_counter() - start) * 1000, 1)
+            if not cypher:
+                raise ValueError("no Cypher could be generated")
+            record["cypher"] = cypher
+
+            start = time.perf_counter()
+            context = self.result_cache.get_rows(cypher)
+            if context is None:
+                context = await asyncio.to_thread(self.run_cypher, cypher)
+                self.result_cache.put_rows(cypher, None, context)
+            if not cached:
+                await asyncio.to_thread(self.cypher_cache.put, question, self.schema_fp, cypher)
+            latency["query"] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            answer = self.result_cache.get_answer(question, context)
+            if answer is None:
+                answer = await self.agenerate_answer(question, context)
+                self.result_cache.put_answer(question, context, answer)
+            latency["answer"] = round((time.perf_counter() - start) * 1000, 1)
+            record["answer"] = answer
+
+        except Exception as e:
+            logger.error(f"Error processing question '{question}': {e}")
+            record["error"] = str(e)
+        return record
+
+    async def answer_batch(self, questions, max_workers=BATCH_WORKERS):
+        # Answers all questions with at most `max_workers` in flight; keeps input order
+        self.refresh_if_stale()
+        limit = asyncio.Semaphore(max_workers)
+
+        async def run(question):
+            async with limit:
+                return await self.aask(question)
+
+        return await asyncio.gather(*(run(q) for q in questions))
+
+
+_service = None
+
+
+def get_service():
+    # Shared service for callers that only need `rag(question)`
+    global _service
+    if _service is None:
+        _service = GraphQAService()
+    return _service
+
+
 # === Main Execution Pipeline ===
-# Orchestrates the process:
-# 1. Connects to Neo4j
-# 2. Displays schema for debugging
-# 3. Builds the Cypher QA chain
+# Answers a question with the shared QA service, building it on first use
 def rag(question):
     try:
-        # Setup Neo4j connection
-        graph = setup_neo4j_connection()
-        
-        # Print schema for debugging
-        print("Neo4j Schema:")
-        print(graph.schema)
-        print("\n" + "="*50 + "\n")
-        
-        # Create the QA chain
-        cypher_chain = create_cypher_chain(graph)
-        
-        
-       
-        result = ask_question(cypher_chain, question)
+        with span("qa_question"):
+            result = get_service().ask(question)
         print(f"Answer: {result}")
 
             
@@ -193,3 +399,48 @@ def rag(question):
         print(f"Application failed to run: {e}")
 
 
+# === Batch Question Answering ===
+# Questions file: one question per line, or JSONL records with a "question" field.
+# Results are written as JSONL, one record per question in input order.
+def read_questions(path):
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def run_batch(questions_path, output_path, max_workers=BATCH_WORKERS):
+    questions = read_questions(questions_path)
+    start = time.perf_counter()
+    records = asyncio.run(get_service().answer_batch(questions, max_workers=max_workers))
+    elapsed = time.perf_counter() - start
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    failed = sum(1 for r in records if r["error"])
+    print(f"Answered {len(records) - failed}/{len(records)} questions in {elapsed:.1f}s -> {output_path}")
+    for stage in ("intent", "cypher", "query", "answer"):
+        times = [r["latency_ms"][stage] for r in records if stage in r["latency_ms"]]
+        if times:
+            print(f"  {stage:<7} mean {sum(times) / len(times):8.1f} ms  max {max(times):8.1f} ms")
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer questions over the Neo4j knowledge graph")
+    parser.add_argument("question", nargs="?", help="single question to answer")
+    parser.add_argument("--batch", help="file with one question per line (or JSONL)")
+    parser.add_argument("--out", default="answers.jsonl", help="JSONL output for --batch")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="concurrent questions for --batch")
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args.batch, args.out, max_workers=args.workers)
+    else:
+        rag(args.question or input("Ask question: "))
@@ -0,0 +1,88 @@
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from json_to_graph import normalize_link
+
+# SQLite caps the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+
+def fingerprint(text):
+    # Content fingerprint of a page body (whitespace-insensitive)
+    return hashlib.sha256(" ".join(str(text).split()).encode("utf-8")).hexdigest()
+
+
+# === Seen-URL Store ===
+# On-disk record of every article URL (and content fingerprint) already
+# ingested, so repeated crawls only fetch and extract new articles.
+# SQLite in WAL mode keeps it crash-safe: a row is either committed or absent.
+class SeenStore:
+    def __init__(self, path="seen_urls.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                first_seen TEXT,
+                last_seen TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS seen_fingerprint ON seen(fingerprint)")
+        self.conn.commit()
+
+    def __contains__(self, url):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM seen WHERE url = ?", (normalize_link(url),)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def filter_new(self, urls):
+        # Returns the URLs not yet ingested, preserving order
+        urls = list(urls)
+        keys = {url: normalize_link(url) for url in urls}
+        known = set()
+        unique_keys = list(set(keys.values()))
+        with self._lock:
+            for i in range(0, len(unique_keys), LOOKUP_CHUNK):
+                chunk = unique_keys[i:i + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                known.update(
+                    row[0] for row in self.conn.execute(
+                        f"SELECT url FROM seen WHERE url IN ({placeholders})", chunk
+                    )
+                )
+        return [url for url in urls if keys[url] not in known]
+
+    def has_fingerprint(self, fp):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM seen WHERE fingerprint = ? LIMIT 1", (fp,)
+            ).fetchone()
+        return row is not None
+
+    def add(self, url, fp=""):
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO seen (url, fingerprint, first_seen, last_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    last_seen = excluded.last_seen
+            """, (normalize_link(url), fp, now, now))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()